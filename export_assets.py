@@ -1,30 +1,79 @@
+import argparse
+import os
 import shutil
+import timeit
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from miyu_bot.commands.common.asset_paths import get_asset_filename
+from miyu_bot.commands.common.asset_paths import (
+    find_exported_assets,
+    get_asset_filename,
+    update_asset_manifest,
+)
+
+
+def export_file(source: Path, target: Path, link: bool) -> int:
+    """Exports a file unless already exported, returning its size if exported.
+
+    Exported filenames contain the hash of the content, so an existing
+    file with the same name is up to date.
+    """
+    if target.exists():
+        return 0
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_target = target.with_name(f".{target.name}.tmp")
+    if link:
+        try:
+            os.link(source, tmp_target)
+        except OSError:
+            # e.g. on a different filesystem
+            link = False
+    if not link:
+        # Uses os.sendfile on Linux, so the data isn't copied through Python
+        shutil.copyfile(source, tmp_target)
+    os.replace(tmp_target, target)
+    return source.stat().st_size
 
 
 def main():
-    for p in ["assets", "assets_en"]:
-        base_path = Path(p)
-        target_path = Path("export")
-
-        asset_paths = [
-            "music_jacket/*.jpg",
-            "ondemand/card_chara/*.jpg",
-            "ondemand/card_icon/*.jpg",
-            "ondemand/chart/*.png",
-            "ondemand/event/*/*.jpg",
-            "ondemand/event/*/*.png",
-            "ondemand/gacha/top/banner/*.png",
-            "ondemand/loginBonus/*.jpg",
-        ]
-
-        for asset_path in asset_paths:
-            for path in base_path.glob(asset_path):
-                target_file = target_path / get_asset_filename(path)
-                if not target_file.exists():
-                    shutil.copy(path, target_file)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target", type=Path, default=Path("export"))
+    parser.add_argument("--jobs", type=int, default=min(8, os.cpu_count() or 1))
+    parser.add_argument(
+        "--link",
+        action="store_true",
+        help="hardlink instead of copying where possible",
+    )
+    args = parser.parse_args()
+
+    start_time = timeit.default_timer()
+    paths = [
+        path for p in ["assets", "assets_en"] for path in find_exported_assets(Path(p))
+    ]
+    scan_time = timeit.default_timer()
+    hashed = update_asset_manifest(paths, max_workers=args.jobs)
+    hash_time = timeit.default_timer()
+
+    with ThreadPoolExecutor(args.jobs) as executor:
+        exported_sizes = list(
+            executor.map(
+                lambda path: export_file(
+                    path, args.target / get_asset_filename(path), args.link
+                ),
+                paths,
+            )
+        )
+    end_time = timeit.default_timer()
+
+    exported = sum(1 for size in exported_sizes if size)
+    total_bytes = sum(exported_sizes)
+    print(f"Found {len(paths)} assets in {scan_time - start_time:.2f}s.")
+    print(f"Hashed {hashed} changed assets in {hash_time - scan_time:.2f}s.")
+    print(
+        f"Exported {exported} assets ({total_bytes / 2 ** 20:.1f} MiB) in "
+        f"{end_time - hash_time:.2f}s "
+        f"({total_bytes / 2 ** 20 / max(end_time - hash_time, 1e-9):.1f} MiB/s)."
+    )
 
 
 if __name__ == "__main__":
@@ -1,5 +1,4 @@
 import asyncio
-import datetime
 import json
 import logging
 import sys
@@ -10,11 +9,10 @@ import discord
 from discord import Intents
 from discord.ext import commands
 from discord.ext.commands import Cog, when_mentioned
-from tortoise.expressions import F
 
 from miyu_bot.bot import models
 from miyu_bot.bot.bot import MiyuBot
-from miyu_bot.bot.models import CommandUsageCount
+from miyu_bot.bot.models import usage_counter
 from miyu_bot.commands.common.argument_parsing import ArgumentError
 
 logging.basicConfig(level=logging.INFO)
@@ -92,13 +90,7 @@ async def main():
     async def on_command(ctx: commands.Context):
         if not ctx.guild:
             return
-        cnt, _ = await CommandUsageCount.get_or_create(
-            guild_id=ctx.guild.id,
-            name=ctx.command.qualified_name,
-            date=datetime.datetime.utcnow().date(),
-        )
-        cnt.counter = F("counter") + 1
-        await cnt.save()
+        usage_counter.log_command(ctx.guild.id, ctx.command.qualified_name)
 
     async with bot:
         await bot.start(bot_token)
@@ -1,4 +1,6 @@
+import asyncio
 import datetime
+import logging
 from concurrent.futures.thread import ThreadPoolExecutor
 from pathlib import Path
 from types import SimpleNamespace
@@ -16,11 +18,23 @@ from pytz.tzinfo import StaticTzInfo, DstTzInfo
 from tortoise import Tortoise
 
 from miyu_bot.bot.chart_scorer import ChartScorer
+from miyu_bot.bot.chart_scoring_engine import ChartScoringEngine
 from miyu_bot.bot.common_aliases import CommonAliases
+from miyu_bot.bot.leaderboard_service import LeaderboardService
+from miyu_bot.bot.models import usage_counter
 from miyu_bot.bot.servers import Server
 from miyu_bot.bot.tortoise_config import TORTOISE_ORM
 from miyu_bot.commands.cogs.preferences import get_preferences
-from miyu_bot.commands.common.asset_paths import clear_asset_filename_cache
+from miyu_bot.commands.common.asset_paths import (
+    clear_asset_filename_cache,
+    load_asset_manifest,
+)
+from miyu_bot.commands.common.fuzzy_matching import (
+    load_romanization_cache,
+    save_romanization_cache,
+)
+from miyu_bot.commands.common.image_encoding import ImageEncoding
+from miyu_bot.commands.common.result_cache import ResultCache
 from miyu_bot.commands.master_filter.master_filter_manager import MasterFilterManager
 
 
@@ -29,6 +43,12 @@ class MiyuBot(commands.Bot):
     master_filters: MasterFilterManager
     aliases: CommonAliases
     thread_pool: ThreadPoolExecutor
+    chart_scorer: ChartScorer
+    chart_scoring_engine: ChartScoringEngine
+    filter_result_cache: ResultCache
+    embed_cache: ResultCache
+    preference_cache: ResultCache
+    leaderboards: LeaderboardService
 
     asset_path: Path
     asset_url = "https://miyu-data.qwewqa.xyz/"
@@ -39,6 +59,7 @@ class MiyuBot(commands.Bot):
     def __init__(self, asset_path, gen_doc: bool = False, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.setup_tasks = []
+        self.usage_flush_task = None
         self.gen_doc = gen_doc
         self.asset_path = Path(asset_path)
         self.assets = {
@@ -55,8 +76,16 @@ class MiyuBot(commands.Bot):
         }
         self.fluent_loader = FluentResourceLoader("l10n/{locale}")
         self.aliases = CommonAliases(self.assets)
+        self.filter_result_cache = ResultCache(maxsize=1024, ttl=60 * 60)
+        self.embed_cache = ResultCache(maxsize=512, ttl=60 * 60)
+        # Updated by setpref and clearpref, the ttl picks up changes made elsewhere
+        self.preference_cache = ResultCache(maxsize=50000, ttl=10 * 60)
+        load_asset_manifest()
+        load_romanization_cache(self.romanization_cache_path)
         self.master_filters = MasterFilterManager(self)
+        self.save_romanization_cache()
         self.session = aiohttp.ClientSession()
+        self.leaderboards = LeaderboardService(self.session)
         self.extension_names = set()
         self.thread_pool = ThreadPoolExecutor()
         self.scripts_path = None
@@ -66,11 +95,47 @@ class MiyuBot(commands.Bot):
                 **self.assets[Server.JP].chart_master,
             }
         )
+        self.chart_scoring_engine = ChartScoringEngine(
+            {
+                Server.JP: self.asset_path / "jp",
+                Server.EN: self.asset_path / "en",
+            }
+        )
         self.help_command = MiyuHelp()
 
+    @property
+    def image_encoding(self) -> ImageEncoding:
+        return ImageEncoding(**getattr(self, "config", {}).get("image_encoding", {}))
+
+    @property
+    def romanization_cache_path(self) -> Path:
+        return self.asset_path / "romanization_cache.json"
+
+    def save_romanization_cache(self):
+        if self.gen_doc:
+            return
+        try:
+            save_romanization_cache(self.romanization_cache_path)
+        except OSError:
+            logging.getLogger(__name__).warning("Failed to save romanization cache.")
+
     async def setup_hook(self) -> None:
         for task in self.setup_tasks:
             await task
+        self.usage_flush_task = asyncio.create_task(self.flush_usage_counts_loop())
+
+    async def flush_usage_counts_loop(self, interval: float = 60):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush_usage_counts()
+
+    async def flush_usage_counts(self):
+        try:
+            await usage_counter.flush()
+        except Exception:
+            logging.getLogger(__name__).warning(
+                "Failed to flush usage counts.", exc_info=True
+            )
 
     def try_reload_assets(self):
         try:
@@ -92,10 +157,30 @@ class MiyuBot(commands.Bot):
             return False
         for a in self.assets.values():
             a.db.close()
+        # Would otherwise finish with the old assets after the new one starts
+        self.master_filters.charts.cancel_score_table_build()
         self.assets = assets
         self.master_filters = master_filters
         self.aliases = aliases
+        self.chart_scorer.clear()
+        self.chart_scorer = ChartScorer(
+            {
+                **assets[Server.EN].chart_master,
+                **assets[Server.JP].chart_master,
+            }
+        )
+        # Workers hold their own copy of the assets, so they need to be restarted
+        self.chart_scoring_engine.shutdown()
+        self.chart_scoring_engine = ChartScoringEngine(
+            {
+                Server.JP: self.asset_path / "assets_jp",
+                Server.EN: self.asset_path / "assets_en",
+            }
+        )
+        self.filter_result_cache.clear()
+        self.embed_cache.clear()
         clear_asset_filename_cache()
+        self.save_romanization_cache()
         return True
 
     async def login(self, token):
@@ -103,6 +188,10 @@ class MiyuBot(commands.Bot):
         await super(MiyuBot, self).login(token)
 
     async def close(self):
+        if self.usage_flush_task:
+            self.usage_flush_task.cancel()
+        await self.flush_usage_counts()
+        self.chart_scoring_engine.shutdown()
         await self.session.close()
         await Tortoise.close_connections()
         await super(MiyuBot, self).close()
@@ -1,15 +1,49 @@
-import functools
-from typing import Dict, Tuple, Union, List, Optional
+import copy
+import math
+from collections import defaultdict
+from typing import Dict, Tuple, Union, List, Optional, Sequence
+
+import numpy as np
 
 from d4dj_utils.chart.chart import Chart
 from d4dj_utils.chart.score_calculator import ChartScoringData, get_chart_scoring_data
 from d4dj_utils.master.chart_master import ChartMaster
 from d4dj_utils.master.skill_master import SkillMaster
 
+from miyu_bot.commands.common.result_cache import ResultCache, approximate_size
+
+
+# Skill attributes other than the score up rate that affect scoring
+_SKILL_SHAPE_ATTRIBUTES = (
+    "max_seconds",
+    "min_seconds",
+    "perfect_score_up_rate",
+    "combo_support_count",
+    "min_recovery_value",
+    "max_recovery_value",
+)
+_PROBE_SCORE_UP = 100
+# Skill durations are rounded to this many seconds when looking up scoring data,
+# so that arbitrary user provided durations can't each create a new entry.
+# Durations in game are multiples of this.
+_DURATION_QUANTUM = 0.05
+_missing = object()
+_requested = object()
+
 
 class ChartScorer:
-    def __init__(self, chart_masters: Dict[int, ChartMaster]):
+    def __init__(
+        self,
+        chart_masters: Dict[int, ChartMaster],
+        chart_cache_bytes: int = 128 * 2**20,
+        scoring_data_cache_bytes: int = 256 * 2**20,
+    ):
         self.chart_masters = chart_masters
+        self._charts = ResultCache(maxsize=None, maxbytes=chart_cache_bytes)
+        self._scoring_data = ResultCache(
+            maxsize=None, maxbytes=scoring_data_cache_bytes
+        )
+        self._score_weights = ResultCache(maxsize=20000)
 
     def score(
         self,
@@ -51,15 +85,245 @@ class ChartScorer:
             combo_bonus_multiplier=enable_combo_bonus,
         )
 
-    @functools.lru_cache(maxsize=None)
-    def get_chart(self, cid: int, /) -> Optional[Chart]:
-        try:
-            return self.chart_masters[cid].load_chart_data()
-        except FileNotFoundError:
+    def score_batch(
+        self,
+        chart: Union[ChartMaster, Chart],
+        power: int,
+        skill_matrix: Sequence[Sequence[SkillMaster]],
+        **options,
+    ) -> List[float]:
+        """Scores a chart once for each row of skills.
+
+        Gives the same results as calling score for each row. For a ChartMaster, the score
+        is modeled as linear in the skills' score up rates, with one weight per skill slot
+        found once per chart and options, so all rows are evaluated as one matrix product.
+        The model is checked against direct evaluations of up to two rows with score up,
+        and rows are scored directly if it does not reproduce them.
+        """
+        results: List[Optional[float]] = [None] * len(skill_matrix)
+        rows_by_shape = defaultdict(list)
+        for i, skills in enumerate(skill_matrix):
+            rows_by_shape[self._get_skill_shape(skills)].append(i)
+        for shape, rows in rows_by_shape.items():
+            weights = None
+            if isinstance(chart, ChartMaster):
+                # Finding weights takes a few evaluations,
+                # so for only a few rows it's only worth it if they are requested again
+                weights = self.get_score_weights(
+                    chart,
+                    power,
+                    skill_matrix[rows[0]],
+                    shape,
+                    options,
+                    build=len(rows) > len(skill_matrix[rows[0]]) + 1,
+                )
+            if weights is None:
+                for i in rows:
+                    results[i] = self.score(chart, power, skill_matrix[i], **options)
+                continue
+            weight_vector, result_type = weights
+            rates = np.array(
+                [[s.score_up_rate for s in skill_matrix[i]] for i in rows],
+                dtype=np.float64,
+            )
+            scores = weight_vector[0] + rates @ weight_vector[1:]
+            checked = [j for j, row_rates in enumerate(rates) if row_rates.any()][:2]
+            checks = {
+                j: self.score(chart, power, skill_matrix[rows[j]], **options)
+                for j in checked
+            }
+            if not all(self._matches(checks[j], scores[j]) for j in checked):
+                for i in rows:
+                    results[i] = self.score(chart, power, skill_matrix[i], **options)
+                continue
+            if result_type is int:
+                scores = np.rint(scores).astype(np.int64)
+            for i, score in zip(rows, scores.tolist()):
+                results[i] = score
+        return results
+
+    def rank_skill_orders(
+        self,
+        chart: Union[ChartMaster, Chart],
+        power: int,
+        orders: Sequence[Sequence[SkillMaster]],
+        top: int,
+        candidates: Optional[int] = None,
+        **options,
+    ) -> List[Tuple[float, int]]:
+        """Returns the score and index of the best scoring orders of skills, best first.
+
+        If there are more orders than candidates (twice top by default), they are first
+        ranked by an estimate, and only the best candidates are scored fully.
+        """
+        candidates = candidates or 2 * top
+        indices = list(range(len(orders)))
+        if len(orders) > candidates and isinstance(chart, ChartMaster):
+            estimates = self._estimate_order_scores(chart, power, orders, options)
+            if estimates is not None:
+                indices = np.argsort(-estimates, kind="stable")[:candidates].tolist()
+        scores = self.score_batch(chart, power, [orders[i] for i in indices], **options)
+        ranked = sorted(zip(scores, indices), key=lambda entry: -entry[0])
+        return ranked[:top]
+
+    def _estimate_order_scores(
+        self,
+        chart: ChartMaster,
+        power: int,
+        orders: Sequence[Sequence[SkillMaster]],
+        options: dict,
+    ) -> Optional[np.ndarray]:
+        # Slot weights depend on the durations of the skills before them,
+        # so find them once with every skill at the average duration
+        # and scale each skill's score up by how much longer or shorter it lasts.
+        # Without different durations, this is exact.
+        average_duration = quantize_duration(
+            float(np.mean([s.max_seconds for order in orders for s in order]))
+        )
+        if average_duration <= 0:
+            return None
+        reference = []
+        for skill in orders[0]:
+            reference_skill = copy.copy(skill)
+            reference_skill.max_seconds = average_duration
+            reference.append(reference_skill)
+        weights = self.get_score_weights(
+            chart, power, reference, self._get_skill_shape(reference), options
+        )
+        if weights is None:
             return None
+        weight_vector, _ = weights
+        effective_rates = np.array(
+            [
+                [s.score_up_rate * s.max_seconds / average_duration for s in order]
+                for order in orders
+            ],
+            dtype=np.float64,
+        )
+        return weight_vector[0] + effective_rates @ weight_vector[1:]
+
+    def get_score_weights(
+        self,
+        chart: ChartMaster,
+        power: int,
+        skills: Sequence[SkillMaster],
+        shape: tuple,
+        options: dict,
+        build: bool = True,
+    ) -> Optional[Tuple[np.ndarray, type]]:
+        """Returns the base score followed by the score per point of score up in each slot.
+
+        Returns None if scores are not linear in score up rates for these inputs,
+        or if the weights aren't cached yet, build is False,
+        and they haven't been requested before.
+        """
+        key = (chart.id, shape, power, tuple(sorted(options.items())))
+        cached = self._score_weights.get(key, default=_missing)
+        if cached is not _missing and cached is not _requested:
+            return cached
+        if not build and cached is not _requested:
+            self._score_weights.put(key, _requested)
+            return None
+
+        def probe(rates):
+            return self.score(
+                chart, power, self._with_score_up_rates(skills, rates), **options
+            )
+
+        base = probe([0] * len(skills))
+        slot_weights = []
+        for slot in range(len(skills)):
+            rates = [0] * len(skills)
+            rates[slot] = _PROBE_SCORE_UP
+            slot_weights.append((probe(rates) - base) / _PROBE_SCORE_UP)
+        weight_vector = np.array([base, *slot_weights], dtype=np.float64)
+
+        # Check the model against a direct evaluation with a distinct non-zero rate
+        # in every slot, which none of the probes (or an all-zero row) would test
+        check_rates = [_PROBE_SCORE_UP * (slot + 3) / 7 for slot in range(len(skills))]
+        actual = probe(check_rates)
+        predicted = weight_vector[0] + float(np.dot(check_rates, weight_vector[1:]))
+        if self._matches(actual, predicted):
+            weights = (weight_vector, int if isinstance(actual, int) else float)
+        else:
+            weights = None
+        self._score_weights.put(key, weights)
+        return weights
+
+    @staticmethod
+    def _matches(actual: float, predicted: float) -> bool:
+        return math.isclose(actual, predicted, rel_tol=1e-9, abs_tol=1e-6)
+
+    @staticmethod
+    def _get_skill_shape(skills: Sequence[SkillMaster]) -> tuple:
+        return tuple(
+            tuple(getattr(s, name, None) for name in _SKILL_SHAPE_ATTRIBUTES)
+            for s in skills
+        )
+
+    @staticmethod
+    def _with_score_up_rates(
+        skills: Sequence[SkillMaster], rates: Sequence[float]
+    ) -> List[SkillMaster]:
+        probe_skills = []
+        for skill, rate in zip(skills, rates):
+            probe_skill = copy.copy(skill)
+            probe_skill.score_up_rate = rate
+            probe_skills.append(probe_skill)
+        return probe_skills
+
+    def get_chart(self, cid: int, /) -> Optional[Chart]:
+        chart = self._charts.get(cid, default=_missing)
+        if chart is _missing:
+            try:
+                chart = self.chart_masters[cid].load_chart_data()
+            except FileNotFoundError:
+                chart = None
+            self._charts.put(
+                cid, chart, size=approximate_size(chart, exclude=self._shared(cid))
+            )
+        return chart
 
-    @functools.lru_cache(maxsize=100000)
     def get_scoring_data(
         self, cid: int, skill_durations: Tuple[float, ...]
     ) -> ChartScoringData:
-        return get_chart_scoring_data(self.get_chart(cid), skill_durations)
+        skill_durations = tuple(quantize_duration(d) for d in skill_durations)
+        key = (cid, skill_durations)
+        scoring_data = self._scoring_data.get(key)
+        if scoring_data is None:
+            chart = self.get_chart(cid)
+            scoring_data = get_chart_scoring_data(chart, skill_durations)
+            # The chart is shared between entries and counted by the chart cache
+            self._scoring_data.put(
+                key,
+                scoring_data,
+                size=approximate_size(
+                    scoring_data, exclude=[chart, *self._shared(cid)]
+                ),
+            )
+        return scoring_data
+
+    def _shared(self, cid: int) -> list:
+        # Charts may reference their master and through it the asset manager,
+        # neither of which should count towards the budget
+        master = self.chart_masters[cid]
+        return [master, getattr(master, "assets", None)]
+
+    def clear(self):
+        """Drops all cached charts and scoring data, e.g. after assets are reloaded."""
+        self._charts.clear()
+        self._scoring_data.clear()
+        self._score_weights.clear()
+
+    def cache_stats(self) -> Dict[str, str]:
+        return {
+            "charts": self._charts.stats(),
+            "scoring data": self._scoring_data.stats(),
+            "score weights": self._score_weights.stats(),
+        }
+
+
+def quantize_duration(duration: float) -> float:
+    if duration is None:
+        return duration
+    return round(round(duration / _DURATION_QUANTUM) * _DURATION_QUANTUM, 6)
@@ -0,0 +1,179 @@
+import asyncio
+import functools
+import logging
+import math
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pytz
+from d4dj_utils.master.asset_manager import AssetManager
+from d4dj_utils.master.chart_master import ChartMaster
+from d4dj_utils.master.skill_master import SkillMaster
+
+from miyu_bot.bot.chart_scorer import ChartScorer
+from miyu_bot.bot.servers import Server
+
+# (score up, duration) pairs, one per team member
+SkillValues = Sequence[Tuple[float, float]]
+# SkillMaster keyword arguments for each team member, and ChartScorer.score options
+ScoringPreset = Tuple[Sequence[Dict[str, Any]], Dict[str, Any]]
+
+# Per worker process state, set up once by _initialize_worker
+_worker_scorer: Optional[ChartScorer] = None
+_worker_assets: Optional[AssetManager] = None
+
+
+def _initialize_worker(asset_dirs: Dict[Server, Path]):
+    global _worker_scorer, _worker_assets
+    assets = {
+        server: AssetManager(path, timezone=pytz.UTC, drop_extra_fields=True)
+        for server, path in asset_dirs.items()
+    }
+    _worker_assets = assets[Server.JP]
+    _worker_scorer = ChartScorer(
+        {
+            **assets[Server.EN].chart_master,
+            **assets[Server.JP].chart_master,
+        }
+    )
+
+
+def _score_charts(
+    chart_ids: List[int],
+    skill_permutations: List[SkillValues],
+    weights: List[float],
+    power: int,
+    options: dict,
+) -> List[float]:
+    skill_sets = [
+        [
+            SkillMaster(_worker_assets, score_up_rate=score_up, max_seconds=duration)
+            for score_up, duration in perm
+        ]
+        for perm in skill_permutations
+    ]
+    weights = np.array(weights, dtype=np.float64)
+    total_weight = weights.sum()
+    results = []
+    for chart_id in chart_ids:
+        chart = _worker_scorer.chart_masters[chart_id]
+        scores = _worker_scorer.score_batch(chart, power, skill_sets, **options)
+        results.append(float(np.dot(scores, weights) / total_weight))
+    return results
+
+
+def _score_presets(
+    chart_ids: List[int],
+    presets: List[ScoringPreset],
+    power: int,
+) -> List[List[float]]:
+    skill_sets = [
+        [SkillMaster(_worker_assets, **fields) for fields in skills]
+        for skills, _ in presets
+    ]
+    # Presets that only differ in skills can be batched together
+    presets_by_options = defaultdict(list)
+    for i, (_, options) in enumerate(presets):
+        presets_by_options[tuple(sorted(options.items()))].append(i)
+    results = []
+    for chart_id in chart_ids:
+        chart = _worker_scorer.chart_masters[chart_id]
+        row = [0.0] * len(presets)
+        for options, indices in presets_by_options.items():
+            scores = _worker_scorer.score_batch(
+                chart, power, [skill_sets[i] for i in indices], **dict(options)
+            )
+            for i, score in zip(indices, scores):
+                row[i] = float(score)
+        results.append(row)
+    return results
+
+
+class ChartScoringEngine:
+    """Scores charts in a pool of worker processes so the event loop isn't blocked.
+
+    Each worker loads the assets once when it starts,
+    and keeps loaded charts and scoring data cached between calls.
+    """
+
+    def __init__(self, asset_dirs: Dict[Server, Path], max_workers: int = None):
+        self.asset_dirs = asset_dirs
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.logger = logging.getLogger(__name__)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # Created on first use, so nothing is started when generating docs
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                # Forking would copy the bot's event loop and connections
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initialize_worker,
+                initargs=(self.asset_dirs,),
+            )
+        return self._pool
+
+    async def score_weighted(
+        self,
+        charts: Sequence[ChartMaster],
+        skill_permutations: Sequence[SkillValues],
+        weights: Sequence[float],
+        power: int,
+        **options,
+    ) -> List[float]:
+        """Returns the weighted average score over the skill permutations for each chart.
+
+        Options are passed on to ChartScorer.score.
+        """
+        shard_results = await self._map_chart_shards(
+            _score_charts,
+            charts,
+            [tuple(perm) for perm in skill_permutations],
+            list(weights),
+            power,
+            options,
+        )
+        return [score for scores in shard_results for score in scores]
+
+    async def score_table(
+        self,
+        charts: Sequence[ChartMaster],
+        presets: Sequence[ScoringPreset],
+        power: int,
+    ) -> np.ndarray:
+        """Returns the score of each chart (rows) for each preset (columns)."""
+        shard_results = await self._map_chart_shards(
+            _score_presets, charts, list(presets), power
+        )
+        return np.array(
+            [row for rows in shard_results for row in rows], dtype=np.float64
+        ).reshape(len(charts), len(presets))
+
+    async def _map_chart_shards(self, func, charts: Sequence[ChartMaster], *args):
+        chart_ids = [chart.id for chart in charts]
+        if not chart_ids:
+            return []
+        # A few shards per worker to even out differences in chart length
+        shard_size = math.ceil(len(chart_ids) / (self.max_workers * 4))
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self.pool,
+                    functools.partial(func, chart_ids[i : i + shard_size], *args),
+                )
+                for i in range(0, len(chart_ids), shard_size)
+            )
+        )
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,121 @@
+import asyncio
+import dataclasses
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+
+from miyu_bot.bot.servers import Server
+
+
+@dataclass(frozen=True)
+class LeaderboardSnapshot:
+    """The leaderboard statistics for a server at some point in time.
+
+    Shared between all users, so the statistics should not be modified.
+    """
+
+    # Statistics by rank as returned by the endpoint, e.g. {"1": {"points": ..., ...}}
+    statistics: Dict[str, dict]
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Incremented whenever the statistics change
+    version: int = 0
+
+    def changes_since(
+        self, other: Optional["LeaderboardSnapshot"]
+    ) -> Dict[str, Tuple[Optional[dict], Optional[dict]]]:
+        """Returns the (old, new) statistics of each rank that differs from other."""
+        old_statistics = other.statistics if other else {}
+        return {
+            rank: (old_statistics.get(rank), self.statistics.get(rank))
+            for rank in self.statistics.keys() | old_statistics.keys()
+            if old_statistics.get(rank) != self.statistics.get(rank)
+        }
+
+
+class LeaderboardService:
+    """Fetches leaderboards and shares them between all commands and loops.
+
+    Snapshots are reused for ttl seconds, concurrent requests for the same server
+    share a single fetch, and refetches are conditional on the data having changed.
+    """
+
+    urls = {
+        Server.JP: "http://www.projectdivar.com/eventdata/t20?chart=true",
+        Server.EN: "http://www.projectdivar.com/eventdata/t20?chart=true&en=true",
+    }
+
+    def __init__(self, session: aiohttp.ClientSession, ttl: float = 30):
+        self.session = session
+        self.ttl = ttl
+        self.logger = logging.getLogger(__name__)
+        self._snapshots: Dict[Server, LeaderboardSnapshot] = {}
+        self._fetches: Dict[Server, asyncio.Future] = {}
+        # The changes in the latest snapshot compared to the one before it
+        self.changes: Dict[Server, Dict[str, Tuple[Optional[dict], ...]]] = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.requests = 0
+        self.not_modified = 0
+
+    async def get(
+        self, server: Server, max_age: Optional[float] = None
+    ) -> LeaderboardSnapshot:
+        max_age = self.ttl if max_age is None else max_age
+        snapshot = self._snapshots.get(server)
+        if snapshot and time.monotonic() - snapshot.fetched_at < max_age:
+            self.hits += 1
+            return snapshot
+        fetch = self._fetches.get(server)
+        if fetch is None:
+            fetch = asyncio.ensure_future(self._fetch(server))
+            self._fetches[server] = fetch
+            fetch.add_done_callback(lambda _: self._fetches.pop(server, None))
+        else:
+            self.coalesced += 1
+        # Shielded so one caller being cancelled doesn't cancel the others
+        return await asyncio.shield(fetch)
+
+    async def _fetch(self, server: Server) -> LeaderboardSnapshot:
+        previous = self._snapshots.get(server)
+        headers = {}
+        if previous and previous.etag:
+            headers["If-None-Match"] = previous.etag
+        if previous and previous.last_modified:
+            headers["If-Modified-Since"] = previous.last_modified
+        self.requests += 1
+        async with self.session.get(self.urls[server], headers=headers) as resp:
+            if resp.status == 304 and previous:
+                self.not_modified += 1
+                snapshot = dataclasses.replace(previous, fetched_at=time.monotonic())
+            else:
+                resp.raise_for_status()
+                statistics = (await resp.json(encoding="utf-8"))["statistics"]
+                version = previous.version if previous else 0
+                if previous is None or previous.statistics != statistics:
+                    version += 1
+                snapshot = LeaderboardSnapshot(
+                    statistics=statistics,
+                    fetched_at=time.monotonic(),
+                    etag=resp.headers.get("ETag"),
+                    last_modified=resp.headers.get("Last-Modified"),
+                    version=version,
+                )
+        if previous is None or snapshot.version != previous.version:
+            self.changes[server] = snapshot.changes_since(previous)
+            self.logger.debug(
+                f"{server.name} leaderboard changed at "
+                f"{len(self.changes[server])} ranks."
+            )
+        self._snapshots[server] = snapshot
+        return snapshot
+
+    def stats(self) -> str:
+        return (
+            f"requests: {self.requests}, not modified: {self.not_modified}, "
+            f"hits: {self.hits}, coalesced: {self.coalesced}"
+        )
@@ -1,13 +1,25 @@
+import asyncio
 import copy
 import datetime
 from abc import abstractmethod
-from typing import ClassVar, Callable, Any, Optional, Dict, Type, Tuple, Union
+from collections import Counter
+from typing import (
+    ClassVar,
+    Callable,
+    Any,
+    Optional,
+    Dict,
+    Type,
+    Tuple,
+    Union,
+    Sequence,
+)
 
 import pytz
 from discord.ext import commands
-from tortoise import Model, fields
-from tortoise.expressions import F
+from tortoise import BaseDBAsyncClient, Model, fields
 from tortoise.models import ModelMeta
+from tortoise.transactions import in_transaction
 
 from miyu_bot.bot.servers import Server, SERVER_NAMES
 from miyu_bot.commands.master_filter.locales import lowercase_locale_mapping
@@ -330,9 +342,100 @@ class GeneralUsageCount(Model):
         unique_together = (("name", "date"),)
 
 
-async def log_usage(name: str):
-    cnt, _ = await GeneralUsageCount.get_or_create(
-        name=name, date=datetime.datetime.utcnow().date()
+class UsageCounter:
+    """Accumulates usage count increments in memory until they're written by flush."""
+
+    def __init__(self):
+        self.command_counts: Counter = Counter()
+        self.general_counts: Counter = Counter()
+        self._flush_lock = asyncio.Lock()
+
+    def log_command(self, guild_id: int, name: str):
+        self.command_counts[guild_id, name, datetime.datetime.utcnow().date()] += 1
+
+    def log_general(self, name: str):
+        self.general_counts[name, datetime.datetime.utcnow().date()] += 1
+
+    async def flush(self):
+        """Adds the accumulated counts to the database with one upsert per table."""
+        async with self._flush_lock:
+            command_counts, self.command_counts = self.command_counts, Counter()
+            general_counts, self.general_counts = self.general_counts, Counter()
+            # Each table is written in a single transaction, so counts are only
+            # kept for the next flush if none of them were written.
+            # Not on cancellation, since the transaction may have committed.
+            try:
+                await _add_counts(
+                    CommandUsageCount, ("guild_id", "name", "date"), command_counts
+                )
+            except Exception:
+                self.command_counts.update(command_counts)
+                self.general_counts.update(general_counts)
+                raise
+            try:
+                await _add_counts(GeneralUsageCount, ("name", "date"), general_counts)
+            except Exception:
+                self.general_counts.update(general_counts)
+                raise
+
+
+async def _add_counts(model: Type[Model], key_fields: Tuple[str, ...], counts: Counter):
+    if not counts:
+        return
+    async with in_transaction(model._meta.default_connection) as connection:
+        await bulk_upsert(
+            model,
+            [*key_fields, "counter"],
+            key_fields,
+            {"counter": '{row}."counter" + EXCLUDED."counter"'},
+            [(*key, count) for key, count in counts.items()],
+            using_db=connection,
+        )
+
+
+async def bulk_upsert(
+    model: Type[Model],
+    columns: Sequence[str],
+    key_columns: Sequence[str],
+    updates: Dict[str, str],
+    rows: Sequence[Sequence[Any]],
+    using_db: Optional[BaseDBAsyncClient] = None,
+    chunk_size: int = 200,
+):
+    """Inserts rows, updating existing rows with the same key columns instead.
+
+    Each row has a value for each of the columns. Updates are SQL expressions by column,
+    where {row} is replaced with the existing row, and EXCLUDED is the new row.
+    Needs a unique constraint on the key columns.
+    """
+    if not rows:
+        return
+    db = using_db or model._meta.db
+    table = f'"{model._meta.db_table}"'
+    column_names = ", ".join(f'"{c}"' for c in columns)
+    key_names = ", ".join(f'"{c}"' for c in key_columns)
+    update_sql = ", ".join(
+        f'"{column}" = {expression.format(row=table)}'
+        for column, expression in updates.items()
     )
-    cnt.counter = F("counter") + 1
-    await cnt.save()
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i : i + chunk_size]
+        if db.capabilities.dialect == "postgres":
+            placeholders = iter([f"${n + 1}" for n in range(len(chunk) * len(columns))])
+        else:
+            placeholders = iter(["?"] * (len(chunk) * len(columns)))
+        values = ", ".join(
+            f"({', '.join(next(placeholders) for _ in columns)})" for _ in chunk
+        )
+        await db.execute_query(
+            f"INSERT INTO {table} ({column_names}) VALUES {values} "
+            f"ON CONFLICT ({key_names}) DO UPDATE SET {update_sql}",
+            [value for row in chunk for value in row],
+        )
+
+
+usage_counter = UsageCounter()
+
+
+async def log_usage(name: str):
+    usage_counter.log_general(name)
@@ -4,6 +4,7 @@ import datetime as dt
 import itertools
 import logging
 import math
+import timeit
 from collections import namedtuple
 from typing import List, Optional, Union
 
@@ -192,13 +193,11 @@ class Event(commands.Cog):
         minutes, seconds = divmod(rem, 60)
         return f"{days}d {hours}h {minutes}m"
 
-    def leaderboard_url(self, ctx: Union[PrefContext, Server]):
-        if (
-            isinstance(ctx, PrefContext) and ctx.preferences.server == Server.EN
-        ) or ctx == Server.EN:
-            return "http://www.projectdivar.com/eventdata/t20?chart=true&en=true"
-        else:
-            return "http://www.projectdivar.com/eventdata/t20?chart=true"
+    @staticmethod
+    def get_server(ctx: Union[PrefContext, Server]) -> Server:
+        if isinstance(ctx, PrefContext):
+            return ctx.preferences.server
+        return ctx
 
     @commands.hybrid_command(
         name="leaderboard",
@@ -229,11 +228,9 @@ class Event(commands.Cog):
         await args.update_preferences(ctx)
         args.require_all_arguments_used()
         event = self.bot.master_filters.events.get_latest_event(ctx)
-        async with self.bot.session.get(self.leaderboard_url(ctx)) as resp:
-            stats = [
-                (int(k), v)
-                for k, v in (await resp.json(encoding="utf-8"))["statistics"].items()
-            ]
+        snapshot = await self.bot.leaderboards.get(self.get_server(ctx))
+        # Copied since the snapshot is shared
+        stats = [(int(k), {**v}) for k, v in snapshot.statistics.items()]
         for _rank, stat in stats:
             stat["points"] = stat["points"] if isinstance(stat["points"], int) else 0
         embeds = []
@@ -268,64 +265,103 @@ class Event(commands.Cog):
 
     valid_tiers = [50, 100, 500, 1000, 2000, 5000, 10000, 20000, 30000, 50000]
 
+    # Maximum number of loop messages being sent at once
+    LOOP_SEND_CONCURRENCY = 8
+
     @tasks.loop(minutes=1)
     async def leaderboard_loop(self):
         # Storing this on the bot object allows it to persist past bot reloads
         if not hasattr(self.bot, "last_leaderboard_loop_data"):
             self.bot.last_leaderboard_loop_data = {Server.JP: {}, Server.EN: {}}
         try:
+            start_time = timeit.default_timer()
+            now = datetime.datetime.now()
+            minutes = now.minute + 60 * now.hour
+            due_intervals = [i for i in valid_loop_intervals if minutes % i == 0]
+
+            # Rendered once for each server and interval with new data
+            texts = {}
             for server in [Server.JP, Server.EN]:
                 event = self.bot.master_filters.events.get_latest_event(server)
-                now = datetime.datetime.now()
-                minutes = now.minute + 60 * now.hour
                 data = await self.get_leaderboard_data(server)
                 last_loop_data = self.bot.last_leaderboard_loop_data[server]
-                for interval in valid_loop_intervals:
-                    if minutes % interval == 0:
-                        if (
-                            interval in last_loop_data
-                            and last_loop_data[interval] == data
-                        ):
-                            continue
-                        prev = last_loop_data.get(interval)
-                        last_loop_data[interval] = data
-                        channels = await models.Channel.filter(loop=interval)
-                        for channel_data in channels:
-                            try:
-                                channel = self.bot.get_channel(channel_data.id)
-                                if not channel:
-                                    self.logger.warning(
-                                        f"Failed to get channel for loop (id: {channel_data.id})."
-                                    )
-                                    continue
-                                guild_data = await models.Channel.get_or_none(
-                                    id=channel.guild.id
-                                )
-                                if channel_data.preference_set("server"):
-                                    channel_server = channel_data.get_preference(
-                                        "server"
-                                    )
-                                elif guild_data and guild_data.preference_set("server"):
-                                    channel_server = guild_data.get_preference("server")
-                                else:
-                                    channel_server = Server.JP
-                                if channel_server != server:
-                                    continue
-                                await channel.send(
-                                    self.get_leaderboard_text(
-                                        event, interval, data, prev
-                                    )
-                                )
-                            except discord.Forbidden:
-                                self.logger.warning(
-                                    f"Failed send for loop (id: {channel_data.id})."
-                                )
-                                continue
+                for interval in due_intervals:
+                    if interval in last_loop_data and last_loop_data[interval] == data:
+                        continue
+                    prev = last_loop_data.get(interval)
+                    last_loop_data[interval] = data
+                    texts[server, interval] = self.get_leaderboard_text(
+                        event, interval, data, prev
+                    )
+            if not texts:
+                return
+            fetch_time = timeit.default_timer()
+
+            channels = []
+            for channel_data in await models.Channel.filter(
+                loop__in=list({interval for _, interval in texts})
+            ):
+                channel = self.bot.get_channel(channel_data.id)
+                if not channel:
+                    self.logger.warning(
+                        f"Failed to get channel for loop (id: {channel_data.id})."
+                    )
+                    continue
+                channels.append((channel, channel_data))
+            guild_ids = {
+                channel.guild.id for channel, _ in channels if channel.guild is not None
+            }
+            guilds = {}
+            if guild_ids:
+                for guild_data in await models.Guild.filter(id__in=guild_ids):
+                    guilds[guild_data.id] = guild_data
+            query_time = timeit.default_timer()
+
+            semaphore = asyncio.Semaphore(self.LOOP_SEND_CONCURRENCY)
+            sends = []
+            for channel, channel_data in channels:
+                guild_data = channel.guild and guilds.get(channel.guild.id)
+                server = self.get_loop_server(channel_data, guild_data)
+                if text := texts.get((server, channel_data.loop)):
+                    sends.append(self.send_loop_message(semaphore, channel, text))
+            await asyncio.gather(*sends)
+            end_time = timeit.default_timer()
+            self.logger.info(
+                f"Leaderboard loop sent {len(sends)} messages for {len(texts)} "
+                f"leaderboards in {end_time - start_time:.2f}s "
+                f"(fetch: {fetch_time - start_time:.2f}s, "
+                f"query: {query_time - fetch_time:.2f}s, "
+                f"send: {end_time - query_time:.2f}s)."
+            )
         except Exception as e:
             self.logger.warning(
                 f'Error in leaderboard loop: {getattr(e, "message", repr(e))}'
             )
 
+    @staticmethod
+    def get_loop_server(
+        channel_data: models.Channel, guild_data: Optional[models.Guild]
+    ) -> Server:
+        if channel_data.preference_set("server"):
+            return channel_data.get_preference("server")
+        elif guild_data and guild_data.preference_set("server"):
+            return guild_data.get_preference("server")
+        else:
+            return Server.JP
+
+    async def send_loop_message(self, semaphore: asyncio.Semaphore, channel, text):
+        # discord.py already waits out rate limits, the semaphore keeps a large number
+        # of channels from all being queued against the global limit at once
+        async with semaphore:
+            try:
+                await channel.send(text)
+            except discord.Forbidden:
+                self.logger.warning(f"Failed send for loop (id: {channel.id}).")
+            except discord.HTTPException as e:
+                self.logger.warning(
+                    f"Failed send for loop (id: {channel.id}, status: {e.status})."
+                )
+
     @leaderboard_loop.before_loop
     async def before_leaderboard_loop(self):
         if self.bot.gen_doc:
@@ -380,15 +416,15 @@ class Event(commands.Cog):
     LBStatistic = namedtuple("LBStatistic", "rank points name")
 
     async def get_leaderboard_data(self, ctx: Union[PrefContext, Server]):
-        async with self.bot.session.get(self.leaderboard_url(ctx)) as resp:
-            return [
-                self.LBStatistic(
-                    int(k),
-                    v["points"] if isinstance(v["points"], int) else 0,
-                    v["name"],
-                )
-                for k, v in (await resp.json(encoding="utf-8"))["statistics"].items()
-            ]
+        snapshot = await self.bot.leaderboards.get(self.get_server(ctx))
+        return [
+            self.LBStatistic(
+                int(k),
+                v["points"] if isinstance(v["points"], int) else 0,
+                v["name"],
+            )
+            for k, v in snapshot.statistics.items()
+        ]
 
     def get_leaderboard_text(
         self,
@@ -421,10 +457,9 @@ class Event(commands.Cog):
         return f"```{header}{body}```"
 
     async def get_tier_embed(self, server, tier: str, event: EventMaster):
-        async with self.bot.session.get(self.leaderboard_url(server)) as resp:
-            leaderboard = await resp.json(encoding="utf-8")
+        snapshot = await self.bot.leaderboards.get(server)
 
-        data = leaderboard["statistics"].get(tier)
+        data = snapshot.statistics.get(tier)
         if not data:
             return None
 
@@ -6,9 +6,8 @@ import math
 import random
 import typing
 from collections import defaultdict
-from io import BytesIO
 from pathlib import Path
-from typing import List, Optional, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import discord
 from PIL import Image
@@ -19,14 +18,19 @@ from d4dj_utils.master.gacha_draw_master import GachaDrawMaster
 from d4dj_utils.master.gacha_master import GachaMaster
 from discord.ext import commands
 from tortoise import BaseDBAsyncClient
-from tortoise.expressions import F
 from tortoise.transactions import in_transaction
 
 from miyu_bot.bot.bot import MiyuBot, PrefContext
-from miyu_bot.bot.models import GachaState, CollectionEntry
+from miyu_bot.bot.models import GachaState, CollectionEntry, bulk_upsert
 from miyu_bot.bot.servers import Server
 from miyu_bot.commands.common.argument_parsing import ParsedArguments
 from miyu_bot.commands.common.asset_paths import get_asset_filename
+from miyu_bot.commands.common.card_icon_atlas import CardIconAtlas, get_card_icon_key
+from miyu_bot.commands.common.image_encoding import (
+    EncodedImage,
+    ImageEncoding,
+    encode_image,
+)
 from miyu_bot.commands.master_filter.localization_manager import LocalizationManager
 
 
@@ -70,6 +74,12 @@ class Gacha(commands.Cog):
             1: self.load_image("CharaIcon_RarityIcon_Evolution.png"),
         }
 
+        self.icon_atlas = CardIconAtlas(
+            self.bot.asset_path / "card_icon_atlas",
+            self.render_card_icon,
+            get_card_icon_key,
+        )
+        self.icon_atlas_task: Optional[asyncio.Task] = None
         self.bot.setup_tasks.append(self.preload_card_icons())
 
         self.l10n = LocalizationManager(self.bot.fluent_loader, "gacha.ftl")
@@ -81,9 +91,18 @@ class Gacha(commands.Cog):
         return image
 
     async def preload_card_icons(self):
-        for card in self.bot.assets[Server.JP].card_master.values():
-            self.get_card_icon(card)
-            await asyncio.sleep(0)
+        # Only icons that changed since the last run need to be rendered,
+        # but that's everything on the first run, so it's left to run in the background
+        self.icon_atlas_task = asyncio.create_task(self.update_icon_atlas())
+
+    async def update_icon_atlas(self):
+        cards = list(self.bot.assets[Server.JP].card_master.values())
+        try:
+            await self.bot.loop.run_in_executor(
+                self.bot.thread_pool, self.icon_atlas.update, cards
+            )
+        except Exception:
+            self.logger.warning("Failed to update card icon atlas.", exc_info=True)
 
     async def create_pull_image(
         self,
@@ -100,12 +119,23 @@ class Gacha(commands.Cog):
 
     async def create_card_image_grid_async(
         self, cards: List[CardMaster], row_size: int = 16
-    ):
+    ) -> EncodedImage:
+        # Encoded in the executor too, since that takes about as long as rendering
         return await self.bot.loop.run_in_executor(
             self.bot.thread_pool,
-            functools.partial(self.create_card_image_grid, cards, row_size),
+            functools.partial(
+                self.create_encoded_card_image_grid,
+                cards,
+                row_size,
+                self.bot.image_encoding,
+            ),
         )
 
+    def create_encoded_card_image_grid(
+        self, cards: List[CardMaster], row_size: int, encoding: ImageEncoding
+    ) -> EncodedImage:
+        return encode_image(self.create_card_image_grid(cards, row_size), encoding)
+
     def create_card_image_grid(self, cards: List[CardMaster], row_size: int = 20):
         column_count = math.ceil(len(cards) / row_size)
         img = Image.new(
@@ -119,15 +149,20 @@ class Gacha(commands.Cog):
         return img
 
     def get_card_icon(self, card: CardMaster):
+        if icon := self.icon_atlas.get(card):
+            return icon
         # Just to avoid caching nonexistent icons, since an asset update may add them
         if not card.icon_path(0).exists():
             return Image.new("RGBA", (259, 259), (255, 255, 255, 0))
         else:
+            # Not in the atlas yet, e.g. added by an asset update
             return self._get_card_icon(card.id)
 
-    @functools.lru_cache(None)
+    @functools.lru_cache(64)
     def _get_card_icon(self, card_id: int):
-        card = self.bot.assets[Server.JP].card_master[card_id]
+        return self.render_card_icon(self.bot.assets[Server.JP].card_master[card_id])
+
+    def render_card_icon(self, card: CardMaster):
         img = Image.new("RGBA", (259, 259), (255, 255, 255, 0))
         with Image.open(card.icon_path(0)) as icon:
             img.paste(icon.crop((11, 11, 247, 247)), (12, 12))
@@ -155,6 +190,10 @@ class Gacha(commands.Cog):
         return img
 
     def cog_unload(self):
+        if self.icon_atlas_task is not None:
+            # A render already running in the thread pool still finishes,
+            # but the atlas is updated atomically
+            self.icon_atlas_task.cancel()
         for image in self.images:
             image.close()
 
@@ -235,14 +274,10 @@ class Gacha(commands.Cog):
 
         img = await self.create_card_image_grid_async(cards)
 
-        buffer = BytesIO()
-        img.save(buffer, "png")
-        buffer.seek(0)
-
         embed = discord.Embed(title=f"{gacha.name}")
-        embed.set_image(url="attachment://cards.png")
+        embed.set_image(url=f"attachment://{img.filename('cards')}")
 
-        await ctx.send(embed=embed, file=discord.File(fp=buffer, filename="cards.png"))
+        await ctx.send(embed=embed, file=img.to_file("cards"))
 
     async def send_overall_pulls_message(self, ctx: PrefContext, user_id: int):
         entries = await CollectionEntry.filter(user_id=user_id)
@@ -259,14 +294,10 @@ class Gacha(commands.Cog):
 
         img = await self.create_card_image_grid_async(cards)
 
-        buffer = BytesIO()
-        img.save(buffer, "png")
-        buffer.seek(0)
-
         embed = discord.Embed(title="Pull Stats")
-        embed.set_image(url="attachment://cards.png")
+        embed.set_image(url=f"attachment://{img.filename('cards')}")
 
-        await ctx.send(embed=embed, file=discord.File(fp=buffer, filename="cards.png"))
+        await ctx.send(embed=embed, file=img.to_file("cards"))
 
     async def do_gacha_draw_and_get_message_data(
         self,
@@ -281,14 +312,10 @@ class Gacha(commands.Cog):
             draw_result.cards, draw_result.bonus, draw_result.sub_bonus
         )
 
-        buffer = BytesIO()
-        img.save(buffer, "png")
-        buffer.seek(0)
-
         embed = discord.Embed(title=f"[{server.name}] {gacha.name}")
         thumb_url = self.bot.asset_url + get_asset_filename(gacha.banner_path)
         embed.set_thumbnail(url=thumb_url)
-        embed.set_image(url="attachment://pull.png")
+        embed.set_image(url=f"attachment://{img.filename('pull')}")
         embed.set_footer(text=str(gacha.id))
 
         desc = f"{user.mention}\n"
@@ -303,7 +330,7 @@ class Gacha(commands.Cog):
             self, GachaPullInvokeData(user, gacha, draw_data, assets, server)
         )
 
-        return view, embed, discord.File(fp=buffer, filename="pull.png")
+        return view, embed, img.to_file("pull")
 
     async def do_gacha_draw(
         self,
@@ -324,6 +351,8 @@ class Gacha(commands.Cog):
             )
             state.total_roll_counter += 1
 
+            # Written together once the draw is done
+            pulls = CollectionPulls(state.total_roll_counter)
             cards = []
             for draw_amount, table_rate in zip(
                 draw_data.draw_amounts, gacha.table_rates
@@ -339,16 +368,7 @@ class Gacha(commands.Cog):
                         i for i, s in enumerate(table_rates) if rng <= s
                     )
                     card = assets.card_master[tables[table_index][result_index].card_id]
-                    await self.register_card_pulled(
-                        user.id,
-                        int(server),
-                        gacha.id,
-                        table_rate.id,
-                        card.id,
-                        state.total_counter,
-                        state.total_roll_counter,
-                        conn,
-                    )
+                    pulls.add(table_rate.id, card.id, state.total_counter)
                     cards.append(card)
 
             bonus = None
@@ -379,17 +399,12 @@ class Gacha(commands.Cog):
                         i for i, s in enumerate(table_rates) if rng <= s
                     )
                     sub_bonus = assets.card_master[
-                        sub_bonus.tables[table_index][result_index].card_id
+                        sub_bonus_tables[table_index][result_index].card_id
                     ]
-                    await self.register_card_pulled(
-                        user.id,
-                        int(server),
-                        gacha.id,
+                    pulls.add(
                         gacha.sub_bonus.table_rate.id,
                         sub_bonus.id,
                         state.total_counter,
-                        state.total_roll_counter,
-                        conn,
                     )
                 if gacha.bonus and current_pity >= gacha.bonus.max_value:
                     state.total_counter += 1
@@ -409,45 +424,68 @@ class Gacha(commands.Cog):
                     bonus = assets.card_master[
                         bonus_tables[table_index][result_index].card_id
                     ]
-                    await self.register_card_pulled(
-                        user.id,
-                        int(server),
-                        gacha.id,
-                        gacha.bonus.table_rate.id,
-                        bonus.id,
-                        state.total_counter,
-                        state.total_roll_counter,
-                        conn,
-                    )
+                    pulls.add(gacha.bonus.table_rate.id, bonus.id, state.total_counter)
 
+            await pulls.save(user.id, int(server), gacha.id, conn)
             await state.save(using_db=conn)
 
             return GachaPullResult(cards, bonus, sub_bonus, current_pity)
 
-    async def register_card_pulled(
-        self,
-        user_id: int,
-        server_id: int,
-        gacha_id: int,
-        table_rate_id: int,
-        card_id: int,
-        pulled_at: int,
-        pulled_at_roll: int,
-        using_db: BaseDBAsyncClient,
+
+class CollectionPulls:
+    """The cards pulled in one roll, added to the user's collection together."""
+
+    def __init__(self, roll: int):
+        self.roll = roll
+        # (table rate id, card id) -> [count, total counter at the first pull]
+        self.entries: Dict[Tuple[int, int], List[int]] = {}
+
+    def add(self, table_rate_id: int, card_id: int, pulled_at: int):
+        if entry := self.entries.get((table_rate_id, card_id)):
+            entry[0] += 1
+        else:
+            self.entries[table_rate_id, card_id] = [1, pulled_at]
+
+    async def save(
+        self, user_id: int, server_id: int, gacha_id: int, using_db: BaseDBAsyncClient
     ):
-        entry, _created = await CollectionEntry.get_or_create(
-            user_id=user_id,
-            server_id=server_id,
-            gacha_id=gacha_id,
-            table_rate_id=table_rate_id,
-            card_id=card_id,
+        await bulk_upsert(
+            CollectionEntry,
+            [
+                "user_id",
+                "server_id",
+                "gacha_id",
+                "table_rate_id",
+                "card_id",
+                "counter",
+                "first_pulled",
+                "first_pulled_roll",
+            ],
+            ["user_id", "server_id", "gacha_id", "table_rate_id", "card_id"],
+            {
+                "counter": '{row}."counter" + EXCLUDED."counter"',
+                "first_pulled": 'CASE WHEN {row}."first_pulled" <= 0 '
+                'THEN EXCLUDED."first_pulled" ELSE {row}."first_pulled" END',
+                "first_pulled_roll": 'CASE WHEN {row}."first_pulled" <= 0 '
+                'THEN EXCLUDED."first_pulled_roll" ELSE {row}."first_pulled_roll" END',
+            },
+            [
+                (
+                    user_id,
+                    server_id,
+                    gacha_id,
+                    table_rate_id,
+                    card_id,
+                    count,
+                    first_pulled,
+                    self.roll,
+                )
+                for (table_rate_id, card_id), (count, first_pulled) in (
+                    self.entries.items()
+                )
+            ],
             using_db=using_db,
         )
-        entry.counter = F("counter") + 1
-        if entry.first_pulled <= 0:
-            entry.first_pulled = pulled_at
-            entry.first_pulled_roll = pulled_at_roll
-        await entry.save()
 
 
 class GachaPullResult(typing.NamedTuple):
@@ -1,11 +1,10 @@
-import asyncio
 import datetime
 import enum
 import itertools
 import logging
 import re
+import timeit
 from dataclasses import dataclass
-from io import BytesIO
 from typing import Tuple, List, Optional
 
 import discord
@@ -20,6 +19,7 @@ from discord.ext import commands
 from miyu_bot.bot.bot import MiyuBot, PrefContext
 from miyu_bot.bot.servers import Server, SERVER_NAMES
 from miyu_bot.commands.common.argument_parsing import ArgumentError
+from miyu_bot.commands.common.image_encoding import encode_image
 from miyu_bot.commands.master_filter.filter_list_view import FilterListView
 from miyu_bot.commands.master_filter.filter_result import FilterResults
 from miyu_bot.commands.master_filter.localization_manager import LocalizationManager
@@ -30,6 +30,8 @@ class Music(commands.Cog):
     CUSTOM_MIX_MIN_LIFETIME = (
         3600  # Minimum amount of time in seconds before a custom mix is removed
     )
+    # All orders of a four member team, only the best are listed for five members
+    max_listed_skill_orders = 24
 
     def __init__(self, bot):
         self.bot = bot
@@ -100,7 +102,8 @@ class Music(commands.Cog):
         Parameters
         ----------
         skills: str
-            A list of skills. E.g. 80,60,50,40 or 60 or 80x6.75,60x9,50x9,40x9
+            A list of skills, leader first. E.g. 80,60,50,40 or 60 or 80x6.75,60x9,50x9,40x9
+            Five skills are treated as a five member team.
         groovy_score_up: float
             Groovy score up percentage
         skill_duration_up: float
@@ -126,11 +129,6 @@ class Music(commands.Cog):
         """
         await ctx.defer()
 
-        def make_skill(score, duration):
-            return SkillMaster(
-                self.bot.assets[Server.JP], score_up_rate=score, max_seconds=duration
-            )
-
         if max_level is None:
             max_level_value = 99999
         else:
@@ -192,11 +190,6 @@ class Music(commands.Cog):
                 skill_permutations.get(perm, 0) + 1
             )
 
-        weighted_skill_permutations = [
-            ([make_skill(score_up, duration) for score_up, duration in perm], weight)
-            for perm, weight in skill_permutations.items()
-        ]
-
         if server is not None:
             server = server.lower()
             if server not in SERVER_NAMES:
@@ -223,28 +216,23 @@ class Music(commands.Cog):
             relative_display = True
             power = 150_000
 
-        async def score_chart(chart):
-            await asyncio.sleep(0)
-            total_score = 0
-            total_weight = 0
-            for skill_perm, weight in weighted_skill_permutations:
-                score = self.bot.chart_scorer.score(
-                    chart=chart,
-                    power=power,
-                    skills=skill_perm,
-                    fever_score_up=groovy_score_up / 100,
-                    enable_fever=not solo,
-                    passive_score_up=passive_score_up / 100,
-                    auto_score_up=general_score_up / 100,
-                    manual_score_up=general_score_up / 100,
-                    autoplay=auto,
-                )
-                total_score += score * weight
-                total_weight += weight
-            return total_score / total_weight
-        
-        tasks = [score_chart(chart) for chart in charts]
-        scores = await asyncio.gather(*tasks)
+        start_time = timeit.default_timer()
+        scores = await self.bot.chart_scoring_engine.score_weighted(
+            charts,
+            list(skill_permutations.keys()),
+            list(skill_permutations.values()),
+            power,
+            fever_score_up=groovy_score_up / 100,
+            enable_fever=not solo,
+            passive_score_up=passive_score_up / 100,
+            auto_score_up=general_score_up / 100,
+            manual_score_up=general_score_up / 100,
+            autoplay=auto,
+        )
+        self.logger.info(
+            f"Scored {len(charts)} charts with {len(skill_permutations)} skill "
+            f"permutations in {timeit.default_timer() - start_time:.2f}s."
+        )
 
         chart_scores = dict(zip(charts, scores))
 
@@ -336,7 +324,8 @@ class Music(commands.Cog):
             The difficulty to use. Defaults to Expert.
             Ignored for mixes.
         skills: str
-            A list of skills. E.g. 80,60,50,40 or 60 or 80x6.75,60x9,50x9,40x9
+            A list of skills, leader first. E.g. 80,60,50,40 or 60 or 80x6.75,60x9,50x9,40x9
+            Five skills are treated as a five member team.
         groovy_score_up: float
             Groovy score up percentage
         skill_duration_up: float
@@ -402,7 +391,7 @@ class Music(commands.Cog):
             for score_up, duration in skill_values
         ]
 
-        if not skill_values or len(skill_values) > 4:
+        if not skill_values or len(skill_values) > 5:
             raise ArgumentError("Invalid skill format")
 
         if len(skill_values) < 4:
@@ -410,10 +399,16 @@ class Music(commands.Cog):
             skill_values += [skill_values[-1]] * (4 - len(skill_values))
 
         leader_skill = skill_values[0]
+        team_size = len(skill_values)
 
-        skill_permutations = set()
-        for perm in itertools.permutations(skill_values):
-            skill_permutations.add(perm + (leader_skill,))
+        if team_size == 5:
+            # Every member activates once, so the leader can be in any slot
+            skill_permutations = set(itertools.permutations(skill_values))
+        else:
+            # The leader's skill activates again after the other members'
+            skill_permutations = set()
+            for perm in itertools.permutations(skill_values):
+                skill_permutations.add(perm + (leader_skill,))
 
         if server is not None:
             server = server.lower()
@@ -445,26 +440,30 @@ class Music(commands.Cog):
             relative_display = True
             power = 150_000
 
-        scores: List[Tuple[int, List[Tuple[int, float]]]] = []
-
-        for skill_perm in skill_permutations:
-            score = self.bot.chart_scorer.score(
-                chart=chart,
-                power=power,
-                skills=[make_skill(*skill) for skill in skill_perm],
-                fever_score_up=groovy_score_up / 100,
-                enable_fever=not solo,
-                passive_score_up=passive_score_up / 100,
-                auto_score_up=general_score_up / 100,
-                manual_score_up=general_score_up / 100,
-                autoplay=auto,
-            )
-            scores.append((score, skill_perm))
+        skill_permutations = list(skill_permutations)
+        ranked_permutations = self.bot.chart_scorer.rank_skill_orders(
+            chart,
+            power,
+            [
+                [make_skill(*skill) for skill in skill_perm]
+                for skill_perm in skill_permutations
+            ],
+            top=self.max_listed_skill_orders,
+            fever_score_up=groovy_score_up / 100,
+            enable_fever=not solo,
+            passive_score_up=passive_score_up / 100,
+            auto_score_up=general_score_up / 100,
+            manual_score_up=general_score_up / 100,
+            autoplay=auto,
+        )
+        scores: List[Tuple[int, List[Tuple[int, float]]]] = [
+            (score, skill_permutations[i]) for score, i in ranked_permutations
+        ]
 
         def format_skill_sequence(skill_sequence: List[Tuple[int, float]]):
             return " ".join(
                 f"{score_up:>2}x{duration:.2f}"
-                for score_up, duration in skill_sequence[:4]
+                for score_up, duration in skill_sequence[:team_size]
             )
 
         def title():
@@ -663,7 +662,8 @@ class Music(commands.Cog):
 
         mix = Chart.create_mix(songs, diffs, mix_masters)
         mix_image = await self.bot.loop.run_in_executor(
-            self.bot.thread_pool, mix.render
+            self.bot.thread_pool,
+            lambda: encode_image(mix.render(), self.bot.image_encoding),
         )
         mix_name = "\n".join(
             f"{song.name} [{diff.name}]" for song, diff in zip(songs, diffs)
@@ -678,10 +678,6 @@ class Music(commands.Cog):
         }
         self.custom_mixes[ctx.author.id] = CustomMixData(mix_name, mix, now)
 
-        buffer = BytesIO()
-        mix_image.save(buffer, "png")
-        buffer.seek(0)
-
         embed = discord.Embed(title="Custom Mix")
         embed.add_field(name="Songs", value=mix_name, inline=False)
         embed.add_field(
@@ -705,9 +701,9 @@ class Music(commands.Cog):
             f'Slide: {note_counts["slide"]} (tick: {note_counts["slide_tick"]}, flick {note_counts["slide_flick"]})',
             inline=True,
         )
-        embed.set_image(url="attachment://mix.png")
+        embed.set_image(url=f"attachment://{mix_image.filename('mix')}")
 
-        await ctx.send(embed=embed, file=discord.File(fp=buffer, filename="mix.png"))
+        await ctx.send(embed=embed, file=mix_image.to_file("mix"))
 
     @commands.command(
         name="mixrating",
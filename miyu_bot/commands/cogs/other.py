@@ -1,15 +1,20 @@
 import asyncio
+import itertools
 import logging
 import textwrap
+import timeit
+from types import SimpleNamespace
 
 import discord
 import yaml
+from d4dj_utils.master.skill_master import SkillMaster
 from discord import app_commands, Interaction
 from discord.ext import commands
 from tortoise.functions import Count, Sum
 
 from miyu_bot.bot.bot import MiyuBot
 from miyu_bot.bot.models import CommandUsageCount, GeneralUsageCount
+from miyu_bot.bot.servers import Server
 from miyu_bot.commands.common.fuzzy_matching import romanize, FuzzyMatcher
 from miyu_bot.commands.common.paged_message import run_paged_message
 from miyu_bot.commands.master_filter.localization_manager import LocalizationManager
@@ -239,9 +244,115 @@ class Other(commands.Cog):
         )
         await ctx.send(embed=embed)
 
+    @commands.command(
+        name="benchmark_filters", aliases=["benchmarkfilters"], hidden=True
+    )
+    @commands.is_owner()
+    async def benchmark_filters(self, ctx: commands.Context, iterations: int = 100):
+        # Benchmark the released-only path, which is the one with a visibility check
+        ctx.preferences = SimpleNamespace(**{**vars(ctx.preferences), "leaks": False})
+        await ctx.send(f"```{self.get_filter_benchmark(ctx, iterations)}```")
+
+    def get_filter_benchmark(self, ctx, iterations: int):
+        lines = []
+        for server in self.bot.assets.keys():
+            for master_filter in self.bot.master_filters.filters:
+                ids = list(master_filter.get_asset_source(None, server).keys())
+                start_time = timeit.default_timer()
+                for _ in range(iterations):
+                    for master_id in ids:
+                        master_filter.get_by_id(master_id, ctx, server)
+                elapsed = timeit.default_timer() - start_time
+                per_call = elapsed / max(iterations * len(ids), 1)
+                lines.append(
+                    f"{server.name} {master_filter.name:<20} {len(ids):>5} "
+                    f"{per_call * 1e6:>8.2f}us"
+                )
+        return "\n".join(lines)
+
+    @commands.command(name="benchmark_list", aliases=["benchmarklist"], hidden=True)
+    @commands.is_owner()
+    async def benchmark_list(self, ctx: commands.Context, iterations: int = 10):
+        # Time to first response for the full card list
+        master_filter = self.bot.master_filters.cards
+        values = list(master_filter.values(ctx))
+        start_time = timeit.default_timer()
+        for _ in range(iterations):
+            view, _embed = master_filter.get_simple_list_view(
+                ctx, values, ctx.preferences.server
+            )
+            view.stop()
+        elapsed = (timeit.default_timer() - start_time) / iterations
+        await ctx.send(f"```{len(values)} cards: {elapsed * 1000:.2f}ms```")
+
+    @commands.command(name="benchmark_meta", aliases=["benchmarkmeta"], hidden=True)
+    @commands.is_owner()
+    async def benchmark_meta(self, ctx: commands.Context):
+        # Scoring on the event loop vs the process pool, for a 24 permutation /meta
+        skill_values = [(80, 6.75), (60, 9), (50, 9), (40, 9)]
+        skill_permutations = [
+            perm + (skill_values[0],) for perm in itertools.permutations(skill_values)
+        ]
+        charts = [
+            chart
+            for chart in self.bot.master_filters.charts.values(ctx)
+            if chart.music.is_available
+            and not chart.music.is_hidden
+            and chart.music.id > 3
+        ]
+
+        async def score_inline():
+            skill_sets = [
+                [
+                    SkillMaster(
+                        self.bot.assets[Server.JP],
+                        score_up_rate=score_up,
+                        max_seconds=duration,
+                    )
+                    for score_up, duration in perm
+                ]
+                for perm in skill_permutations
+            ]
+            for chart in charts:
+                await asyncio.sleep(0)
+                for skills in skill_sets:
+                    self.bot.chart_scorer.score(chart, 150_000, skills)
+
+        async def score_engine():
+            await self.bot.chart_scoring_engine.score_weighted(
+                charts, skill_permutations, [1] * len(skill_permutations), 150_000
+            )
+
+        lines = []
+        for name, coro in [
+            ("inline", score_inline()),
+            ("engine (cold)", score_engine()),
+            ("engine (warm)", score_engine()),
+        ]:
+            elapsed, blocked = await measure_loop_blocking(coro)
+            lines.append(
+                f"{name}: {elapsed * 1000:.0f}ms, longest block {blocked * 1000:.0f}ms"
+            )
+        await ctx.send(f"```{len(charts)} charts\n" + "\n".join(lines) + "```")
+
+    @commands.command(name="cache_stats", aliases=["cachestats"], hidden=True)
+    @commands.is_owner()
+    async def cache_stats(self, ctx: commands.Context):
+        stats = {
+            "filter results": self.bot.filter_result_cache.stats(),
+            "embeds": self.bot.embed_cache.stats(),
+            "preferences": self.bot.preference_cache.stats(),
+            **self.bot.chart_scorer.cache_stats(),
+            "leaderboards": self.bot.leaderboards.stats(),
+        }
+        await ctx.send(
+            "```" + "\n".join(f"{name}: {s}" for name, s in stats.items()) + "```"
+        )
+
     @commands.command(name="command_usage", aliases=["commandusage"], hidden=True)
     @commands.is_owner()
     async def command_usage(self, ctx: commands.Context):
+        await self.bot.flush_usage_counts()
         usage_counts = (
             await CommandUsageCount.all()
             .annotate(use_count=Sum("counter"))
@@ -263,6 +374,7 @@ class Other(commands.Cog):
     @commands.command(name="getstat", hidden=True)
     @commands.is_owner()
     async def getstat(self, ctx: commands.Context, name: str):
+        await self.bot.flush_usage_counts()
         usage = (
             await GeneralUsageCount.filter(name=name)
             .annotate(total_count=Sum("counter"))
@@ -273,6 +385,7 @@ class Other(commands.Cog):
     @commands.command(name="guild_usage", aliases=["guildusage"], hidden=True)
     @commands.is_owner()
     async def guild_usage(self, ctx: commands.Context):
+        await self.bot.flush_usage_counts()
         usage_counts = (
             await CommandUsageCount.all()
             .annotate(use_count=Sum("counter"))
@@ -292,5 +405,27 @@ class Other(commands.Cog):
         )
 
 
+async def measure_loop_blocking(coro, interval: float = 0.005):
+    """Returns the wall time of the coroutine and the longest event loop block."""
+    longest_block = 0.0
+    running = True
+
+    async def monitor():
+        nonlocal longest_block
+        while running:
+            before = timeit.default_timer()
+            await asyncio.sleep(interval)
+            lag = timeit.default_timer() - before - interval
+            longest_block = max(longest_block, lag)
+
+    monitor_task = asyncio.create_task(monitor())
+    start_time = timeit.default_timer()
+    await coro
+    elapsed = timeit.default_timer() - start_time
+    running = False
+    await monitor_task
+    return elapsed, longest_block
+
+
 async def setup(bot):
     await bot.add_cog(Other(bot))
@@ -1,5 +1,6 @@
+import asyncio
 import logging
-from typing import Dict, Type
+from typing import Dict, Optional, Type
 
 from discord.ext import commands
 
@@ -45,6 +46,7 @@ class Preferences(commands.Cog):
             return
         entry.set_preference(name, value)
         await entry.save()
+        cache_preference_scope(ctx.bot, entry)
         await ctx.send(f"Preference updated.")
 
     @commands.hybrid_command(name="getpref", description="", help="")
@@ -95,6 +97,7 @@ class Preferences(commands.Cog):
             return
         entry.clear_preference(name)
         await entry.save()
+        cache_preference_scope(ctx.bot, entry)
         await ctx.send(f"Successfully cleared preference.")
 
 
@@ -107,13 +110,58 @@ preference_scope_aliases: Dict[str, Type[PreferenceScope]] = {
 }
 
 
+_missing = object()
+
+
+def cache_preference_scope(bot, entry: PreferenceScope):
+    """Updates the cached entry after it's saved, so the change applies immediately."""
+    bot.preference_cache.put((type(entry).__name__, entry.id), entry)
+
+
+async def get_preference_scopes(
+    bot, scope_ids: Dict[Type[PreferenceScope], Optional[int]]
+) -> Dict[Type[PreferenceScope], Optional[PreferenceScope]]:
+    """Gets the entry of each scope with the given id, or None if it has no entry.
+
+    Entries are cached, including the absence of one,
+    and ones that aren't cached are loaded concurrently.
+    """
+    entries = {}
+    missing = []
+    for scope, scope_id in scope_ids.items():
+        if scope_id is None:
+            entries[scope] = None
+            continue
+        entry = bot.preference_cache.get((scope.__name__, scope_id), default=_missing)
+        if entry is _missing:
+            missing.append((scope, scope_id))
+        else:
+            entries[scope] = entry
+    if missing:
+        loaded = await asyncio.gather(
+            *(scope.get_or_none(id=scope_id) for scope, scope_id in missing)
+        )
+        for (scope, scope_id), entry in zip(missing, loaded):
+            bot.preference_cache.put((scope.__name__, scope_id), entry)
+            entries[scope] = entry
+    return entries
+
+
 async def get_preferences(ctx: commands.Context, toggle_user_prefs: bool = False):
+    entries = await get_preference_scopes(
+        ctx.bot,
+        {
+            models.Guild: ctx.guild and ctx.guild.id,
+            models.Channel: ctx.channel.id,
+            models.User: ctx.author.id,
+        },
+    )
     sources = []
-    if guild_prefs := ctx.guild and await models.Guild.get_or_none(id=ctx.guild.id):
+    if guild_prefs := entries[models.Guild]:
         sources.append(guild_prefs)
-    if channel_prefs := await models.Channel.get_or_none(id=ctx.channel.id):
+    if channel_prefs := entries[models.Channel]:
         sources.append(channel_prefs)
-    if user_prefs := await models.User.get_or_none(id=ctx.author.id):
+    if user_prefs := entries[models.User]:
         if not toggle_user_prefs:
             sources.append(user_prefs)
 
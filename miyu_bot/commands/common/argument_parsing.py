@@ -277,6 +277,19 @@ class ParsedArguments(discord.ext.commands.Converter):
             values = [ArgumentValue(value.value[0], value.operator) for value in values]
         return values
 
+    def normalized(self):
+        """Returns a hashable form of the arguments that ignores their order."""
+        return (
+            " ".join(self.text_argument.split()),
+            frozenset(self.tag_arguments),
+            tuple(
+                sorted(
+                    (name, tuple((tuple(v.value), v.operator) for v in values))
+                    for name, values in self.named_arguments.items()
+                )
+            ),
+        )
+
     def has_unused(self):
         return self.has_unused_named_arguments() or self.has_unused_tags()
 
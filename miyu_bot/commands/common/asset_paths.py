@@ -1,22 +1,154 @@
+import fnmatch
+import functools
 import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, Tuple
+
+ASSET_ROOT = Path("assets")
+ASSET_MANIFEST_PATH = ASSET_ROOT / "asset_manifest.json"
+
+# Assets that are exported for hosting, relative to an asset directory
+EXPORTED_ASSET_GLOBS = [
+    "music_jacket/*.jpg",
+    "ondemand/card_chara/*.jpg",
+    "ondemand/card_icon/*.jpg",
+    "ondemand/chart/*.png",
+    "ondemand/event/*/*.jpg",
+    "ondemand/event/*/*.png",
+    "ondemand/gacha/top/banner/*.png",
+    "ondemand/loginBonus/*.jpg",
+]
+_exported_asset_patterns = [
+    tuple(asset_glob.split("/")) for asset_glob in EXPORTED_ASSET_GLOBS
+]
 
 _cache = {}
+# Path relative to the asset root -> short hash, loaded from the manifest
+_manifest: Dict[str, str] = {}
 
 
 def clear_asset_filename_cache():
     _cache.clear()
+    load_asset_manifest()
 
 
 def get_asset_filename(path):
-    path = Path(path).resolve()
-    if path in _cache:
-        return _cache[path]
-    if not path.exists():
-        _cache[path] = "unknown.png"
-        return "unknown.png"
-    with path.open("rb") as f:
-        result = f'{path.parent.relative_to(Path("assets").resolve()).as_posix()}/{path.stem}.{hashlib.sha256(f.read()).hexdigest()[:8]}{path.suffix}'
-        result = result.split("/", 1)[1]
-        _cache[path] = result
+    if (result := _cache.get(path)) is not None:
         return result
+    resolved = Path(path).resolve()
+    relative_path = None
+    digest = None
+    if resolved.is_relative_to(_asset_root()):
+        relative_path = resolved.relative_to(_asset_root())
+        digest = _manifest.get(relative_path.as_posix())
+    if digest is None:
+        # Not in the manifest, e.g. added since it was last updated
+        if not resolved.exists():
+            _cache[path] = "unknown.png"
+            return "unknown.png"
+        relative_path = resolved.relative_to(_asset_root())
+        digest = _hash_file(resolved)
+    parent = relative_path.parent.as_posix()
+    result = f"{parent}/{resolved.stem}.{digest}{resolved.suffix}".split("/", 1)[1]
+    _cache[path] = result
+    return result
+
+
+def load_asset_manifest(manifest_path: Path = ASSET_MANIFEST_PATH):
+    _manifest.clear()
+    try:
+        with manifest_path.open() as f:
+            files = json.load(f)["files"]
+    except (OSError, ValueError, KeyError):
+        return
+    _manifest.update({key: entry[0] for key, entry in files.items()})
+
+
+def update_asset_manifest(
+    paths: Iterable[Path],
+    manifest_path: Path = ASSET_MANIFEST_PATH,
+    max_workers: int = None,
+) -> int:
+    """Updates the manifest to contain exactly the given assets and reloads it.
+
+    Only files with a different size or modification time than in the existing
+    manifest are hashed again, using a thread pool of max_workers threads.
+    Returns the number of files hashed.
+    """
+    try:
+        with manifest_path.open() as f:
+            old_files = json.load(f)["files"]
+    except (OSError, ValueError, KeyError):
+        old_files = {}
+    files = {}
+    changed = []
+    for path in paths:
+        path = Path(path).resolve()
+        if not path.is_relative_to(_asset_root()):
+            continue
+        key = path.relative_to(_asset_root()).as_posix()
+        stat = path.stat()
+        entry = old_files.get(key)
+        if entry and entry[1] == stat.st_size and entry[2] == stat.st_mtime_ns:
+            files[key] = entry
+        else:
+            changed.append((key, path, stat))
+    # hashlib releases the GIL while hashing, so threads are enough
+    with ThreadPoolExecutor(max_workers) as executor:
+        digests = executor.map(_hash_file, [path for _, path, _ in changed])
+        for (key, _, stat), digest in zip(changed, digests):
+            files[key] = [digest, stat.st_size, stat.st_mtime_ns]
+    tmp_path = manifest_path.with_suffix(".json.tmp")
+    with tmp_path.open("w") as f:
+        json.dump({"files": files}, f, separators=(",", ":"))
+    os.replace(tmp_path, manifest_path)
+    load_asset_manifest(manifest_path)
+    return len(changed)
+
+
+def find_exported_assets(base_path: Path) -> Iterator[Path]:
+    """Finds the exported assets in an asset directory.
+
+    The tree is walked once, only entering directories that some glob could match.
+    """
+    yield from _find_matching_files(str(base_path), ())
+
+
+def _find_matching_files(directory: str, parts: Tuple[str, ...]) -> Iterator[Path]:
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in sorted(entries, key=lambda e: e.name):
+        child_parts = (*parts, entry.name)
+        depth = len(child_parts)
+        lengths = {
+            len(pattern)
+            for pattern in _exported_asset_patterns
+            if len(pattern) >= depth
+            and all(
+                fnmatch.fnmatchcase(part, pattern_part)
+                for part, pattern_part in zip(child_parts, pattern)
+            )
+        }
+        if entry.is_dir():
+            if any(length > depth for length in lengths):
+                yield from _find_matching_files(entry.path, child_parts)
+        elif depth in lengths:
+            yield Path(entry.path)
+
+
+@functools.lru_cache(None)
+def _asset_root() -> Path:
+    return ASSET_ROOT.resolve()
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()[:8]
@@ -0,0 +1,144 @@
+import json
+import logging
+import mmap
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from PIL import Image
+from d4dj_utils.master.card_master import CardMaster
+
+
+class CardIconAtlas:
+    """Composed card icons stored in a single memory mapped RGBA sheet.
+
+    The sheet is the raw pixel data of every icon one after the other, and an index
+    maps card ids to their position in it. Icons are only rendered again when
+    the key for a card changes, e.g. when its source image is updated.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        render: Callable[[CardMaster], Image.Image],
+        get_key: Callable[[CardMaster], Optional[list]],
+        icon_size: int = 259,
+    ):
+        self.sheet_path = path.with_suffix(".rgba")
+        self.index_path = path.with_suffix(".json")
+        self.render = render
+        self.get_key = get_key
+        self.icon_size = icon_size
+        self.icon_bytes = icon_size * icon_size * 4
+        self.logger = logging.getLogger(__name__)
+        self._update_lock = threading.Lock()
+        # Replaced together when the atlas is updated, readers take a reference first
+        self._state = ({}, None)
+        self._load()
+
+    def _load(self):
+        try:
+            with self.index_path.open() as f:
+                index = json.load(f)
+            if index["icon_size"] != self.icon_size:
+                return
+            with self.sheet_path.open("rb") as f:
+                if index["sheet"] != self._get_sheet_stamp(os.fstat(f.fileno())):
+                    # Interrupted between replacing the sheet and the index
+                    return
+                sheet = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, KeyError):
+            return
+        entries = {int(k): v for k, v in index["cards"].items()}
+        if len(sheet) != len(entries) * self.icon_bytes:
+            return
+        self._state = (entries, sheet)
+
+    @staticmethod
+    def _get_sheet_stamp(stat: os.stat_result) -> list:
+        # Ties an index to the sheet it was written with
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get(self, card: CardMaster) -> Optional[Image.Image]:
+        """Returns the icon of a card, or None if it's not in the atlas."""
+        entries, sheet = self._state
+        entry = entries.get(card.id)
+        if entry is None:
+            return None
+        offset = entry["slot"] * self.icon_bytes
+        return Image.frombuffer(
+            "RGBA",
+            (self.icon_size, self.icon_size),
+            # Not copied, the image reads straight from the mapped sheet
+            memoryview(sheet)[offset : offset + self.icon_bytes],
+            "raw",
+            "RGBA",
+            0,
+            1,
+        )
+
+    def update(self, cards: Iterable[CardMaster]):
+        """Rebuilds the atlas for the given cards, only rendering icons that changed.
+
+        Cards without a key (e.g. no source image yet) are left out.
+        Blocking, should be run in an executor.
+        """
+        with self._update_lock:
+            old_entries, old_sheet = self._state
+            keyed_cards = [
+                (card, key)
+                for card in cards
+                if (key := self.get_key(card)) is not None
+            ]
+            if {card.id for card, _ in keyed_cards} == old_entries.keys() and all(
+                old_entries[card.id]["key"] == key for card, key in keyed_cards
+            ):
+                return
+            entries: Dict[int, dict] = {}
+            rendered = 0
+            tmp_path = self.sheet_path.with_suffix(".rgba.tmp")
+            with tmp_path.open("wb") as f:
+                for card, key in keyed_cards:
+                    old_entry = old_entries.get(card.id)
+                    if old_entry is not None and old_entry["key"] == key:
+                        offset = old_entry["slot"] * self.icon_bytes
+                        f.write(old_sheet[offset : offset + self.icon_bytes])
+                    else:
+                        f.write(self.render(card).convert("RGBA").tobytes())
+                        rendered += 1
+                    entries[card.id] = {"slot": len(entries), "key": key}
+            os.replace(tmp_path, self.sheet_path)
+            index = {
+                "icon_size": self.icon_size,
+                "sheet": self._get_sheet_stamp(self.sheet_path.stat()),
+                "cards": entries,
+            }
+            tmp_index_path = self.index_path.with_suffix(".json.tmp")
+            with tmp_index_path.open("w") as f:
+                json.dump(index, f)
+            os.replace(tmp_index_path, self.index_path)
+            # The old sheet isn't closed, since it may still be read from other threads
+            self._load()
+            self.logger.info(
+                f"Updated card icon atlas with {len(entries)} icons "
+                f"({rendered} rendered)."
+            )
+
+    def __len__(self):
+        return len(self._state[0])
+
+
+def get_card_icon_key(card: CardMaster) -> Optional[List]:
+    """Returns a key that changes whenever the composed icon of a card would."""
+    try:
+        stat = card.icon_path(0).stat()
+    except OSError:
+        return None
+    return [
+        stat.st_mtime_ns,
+        stat.st_size,
+        card.rarity_id,
+        card.attribute_id,
+        card.character.unit_id,
+    ]
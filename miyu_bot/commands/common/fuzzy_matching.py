@@ -1,42 +1,56 @@
+import functools
+import importlib.metadata
+import json
 import logging
 import math
 import re
+import time
 import timeit
 import unicodedata
+from collections import Counter, defaultdict
 from dataclasses import dataclass, field
-from typing import Dict, Tuple, List, Optional
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Tuple, List, Optional, Set, Sequence, Union
 
+import numpy as np
 import pykakasi
 
 
 class FuzzyFilteredMap:
-    def __init__(self, filter_function=None, matcher=None, additive_only_filter=True):
+    def __init__(
+        self,
+        filter_function=None,
+        matcher=None,
+        additive_only_filter=True,
+        release_time_function=None,
+    ):
         self.filter = filter_function or (lambda n: True)
         self.matcher = matcher or FuzzyMatcher()
+        self.index = FuzzyCandidateIndex(self.matcher.config)
         self._map = {}
         self.length_cutoff = 0
         self.logger = logging.getLogger(__name__)
-        self._stale = True
         self.additive_only_filter = additive_only_filter
+        # Returns when a value is expected to pass the filter, or None if unknown
+        self.release_time = release_time_function or (lambda v: None)
+        self._snapshot: Optional[FuzzyMapSnapshot] = None
 
     @property
-    def filtered_items(self):
-        if not self.additive_only_filter:
-            return [(k, v) for k, v in self._map.items() if self.filter(v)]
-        if self._needs_update:
-            self._update_items()
-        return self._filtered_items
+    def snapshot(self) -> "FuzzyMapSnapshot":
+        snapshot = self._snapshot
+        if (
+            snapshot is None
+            or not self.additive_only_filter
+            or snapshot.needs_update(self.filter)
+        ):
+            snapshot = self._snapshot = FuzzyMapSnapshot(
+                self._map, self.filter, self.release_time
+            )
+        return snapshot
 
     @property
-    def _needs_update(self):
-        return self._stale or any(self.filter(v) for k, v in self._filtered_out_items)
-
-    def _update_items(self):
-        self._filtered_items = [(k, v) for k, v in self._map.items() if self.filter(v)]
-        self._filtered_out_items = [
-            (k, v) for k, v in self._map.items() if not self.filter(v)
-        ]
-        self._stale = False
+    def filtered_items(self):
+        return self.snapshot.items
 
     def values(self):
         return FuzzyDictValuesView(self)
@@ -47,16 +61,18 @@ class FuzzyFilteredMap:
     def __delitem__(self, key):
         k = romanize(key)
         del self._map[k]
-        self._stale = True
+        self.index.remove(k)
+        self._snapshot = None
 
     def __setitem__(self, key, value):
-        key = romanize(key)
+        key = romanize_key(key)
         self._map[key] = value
+        self.index.add(key)
         new_cutoff = math.ceil(len(key) * 1.1)
         if new_cutoff > self.length_cutoff:
             self.length_cutoff = new_cutoff
             self.matcher.set_max_length(new_cutoff)
-        self._stale = True
+        self._snapshot = None
 
     def __getitem__(self, key):
         start_time = timeit.default_timer()
@@ -64,27 +80,19 @@ class FuzzyFilteredMap:
         if len(key) > self.length_cutoff:
             self.logger.debug(f'Rejected key "{key}" due to length.')
             return None
-        try:
-            matcher = self.matcher
-            result = min(
-                (
-                    (score, v)
-                    for score, v in (
-                        (matcher.score(key, k), v) for k, v in self.filtered_items
-                    )
-                    if score <= 0
-                ),
-                key=lambda v: v[0],
-            )[1]
-            self.logger.info(
-                f'Found key "{key}" in time {timeit.default_timer() - start_time}.'
-            )
-            return result
-        except ValueError:
+        items, batch = self._candidate_batch(key)
+        scores = self.matcher.score_many(key, batch)
+        matches = scores <= 0
+        if not matches.any():
             self.logger.info(
                 f'Found no results for key "{key}" in time {timeit.default_timer() - start_time}.'
             )
             return None
+        result = items[int(np.argmin(np.where(matches, scores, np.inf)))][1]
+        self.logger.info(
+            f'Found key "{key}" in time {timeit.default_timer() - start_time}.'
+        )
+        return result
 
     def get_sorted(self, key: str):
         start_time = timeit.default_timer()
@@ -92,13 +100,10 @@ class FuzzyFilteredMap:
             self.logger.debug(f'Rejected key "{key}" due to length.')
             return []
         key = romanize(key)
+        items, batch = self._candidate_batch(key)
+        scores = self.matcher.score_many(key, batch)
         values = [
-            v
-            for score, v in sorted(
-                ((self.matcher.score(key, k), v) for k, v in self.filtered_items),
-                key=lambda v: v[0],
-            )
-            if score <= 0
+            items[i][1] for i in np.argsort(scores, kind="stable") if scores[i] <= 0
         ]
         seen_ids = set()
         unique = []
@@ -112,21 +117,74 @@ class FuzzyFilteredMap:
         )
         return unique
 
+    def _candidate_batch(self, key: str):
+        snapshot = self.snapshot
+        items = snapshot.items
+        candidates = self.index.candidates(key)
+        if candidates is None:
+            return items, snapshot.batch
+        indices = [i for i, k in enumerate(snapshot.keys) if k in candidates]
+        # The shortlist should never drop a match, but fall back to the full scan
+        # rather than report no results if it comes up empty
+        if not indices:
+            return items, snapshot.batch
+        return [items[i] for i in indices], snapshot.batch.take(indices)
+
+
+class FuzzyMapSnapshot:
+    """An immutable view of the items in a FuzzyFilteredMap that pass its filter.
+
+    Rather than rechecking the filter on every lookup, filtered out values with a known future
+    release time are only rechecked once the earliest of those times has passed.
+    Values without a known release time are still rechecked on every access.
+    """
+
+    def __init__(self, items: Dict[str, Any], filter_function, release_time_function):
+        now = time.time()
+        filtered_items = []
+        pending_values = []
+        next_release_time = None
+        for k, v in items.items():
+            if filter_function(v):
+                filtered_items.append((k, v))
+                continue
+            release_time = release_time_function(v)
+            if release_time is not None and release_time.timestamp() > now:
+                release_timestamp = release_time.timestamp()
+                if next_release_time is None or release_timestamp < next_release_time:
+                    next_release_time = release_timestamp
+            else:
+                pending_values.append(v)
+        self.items: Tuple[Tuple[str, Any], ...] = tuple(filtered_items)
+        self.keys: Tuple[str, ...] = tuple(k for k, _v in filtered_items)
+        self.value_ids: FrozenSet[int] = frozenset(id(v) for _k, v in filtered_items)
+        unique_values = {id(v): v for _k, v in filtered_items}
+        self.values: Tuple[Any, ...] = tuple(unique_values.values())
+        self.next_release_time: Optional[float] = next_release_time
+        self.pending_values: Tuple[Any, ...] = tuple(pending_values)
+
+    def needs_update(self, filter_function) -> bool:
+        if self.next_release_time is not None and time.time() >= self.next_release_time:
+            return True
+        return any(filter_function(v) for v in self.pending_values)
+
+    @functools.cached_property
+    def batch(self) -> "FuzzyTargetBatch":
+        return FuzzyTargetBatch(self.keys)
+
 
 class FuzzyDictValuesView:
     def __init__(self, source: FuzzyFilteredMap):
         self._map = source
 
     def __contains__(self, item):
-        return item in self._map._map.values() and self._map.filter(item)
+        return id(item) in self._map.snapshot.value_ids
 
     def __iter__(self):
-        seen_ids = set()
-        for _, value in self._map.filtered_items:
-            value_id = id(value)
-            if value_id not in seen_ids:
-                seen_ids.add(value_id)
-                yield value
+        return iter(self._map.snapshot.values)
+
+    def __len__(self):
+        return len(self._map.snapshot.values)
 
 
 @dataclass
@@ -239,6 +297,246 @@ class FuzzyMatcher:
 
         return a[l_src][l_tgt] + word_bonus + base_score
 
+    def score_many(
+        self,
+        source: str,
+        targets: Union["FuzzyTargetBatch", Sequence[str]],
+        threshold=0.0,
+    ) -> np.ndarray:
+        """Scores a source against many targets at once, giving the same results as score.
+
+        The dynamic programming table is advanced one source character at a time for all targets,
+        so the work done in Python scales with the length of the strings rather than the number of targets.
+        Unlike score, this does not use any shared state.
+        """
+        if not isinstance(targets, FuzzyTargetBatch):
+            targets = FuzzyTargetBatch(targets)
+
+        l_src = len(source)
+        lengths = targets.lengths
+        target_count = len(lengths)
+        if not target_count:
+            return np.empty(0)
+
+        config = self.config
+        base_score = config.base_score
+        insertion_weight = config.insertion_weight
+        deletion_weight = config.deletion_weight
+        default_substitution_weight = config.default_substitution_weight
+        match_weight = config.match_weight
+        special_substitution_weights = config.special_substitution_weights
+        word_match_weight = config.word_match_weight
+        whole_match_weight = config.whole_match_weight
+        acronym_match_weight = config.acronym_match_weight
+
+        source_codes = _to_codes(source)
+
+        def positional_matches(codes: np.ndarray, source_codes=source_codes):
+            width = min(codes.shape[-1], len(source_codes))
+            return (codes[..., :width] == source_codes[:width]).sum(axis=-1)
+
+        word_bonus = np.minimum.reduce(
+            [
+                word_match_weight
+                * positional_matches(targets.word_codes).max(axis=-1, initial=0),
+                word_match_weight
+                * positional_matches(targets.abbreviated_word_codes).max(
+                    axis=-1, initial=0
+                ),
+                whole_match_weight
+                * positional_matches(
+                    targets.unspaced_codes, _to_codes(strip_spaces(source))
+                ),
+                acronym_match_weight * positional_matches(targets.acronym_codes),
+            ]
+        )
+
+        threshold = threshold - (word_bonus + base_score)
+
+        codes = targets.codes
+        max_length = codes.shape[0]
+        columns = np.arange(target_count)
+        last_rows = np.maximum(lengths - 1, 0)
+        rejected = lengths == 0
+
+        previous = np.empty((max_length + 1, target_count))
+        previous[:] = (np.arange(max_length + 1) * insertion_weight)[:, None]
+        current = np.empty_like(previous)
+        substitution_weights = {}
+        for i_src in range(1, l_src + 1):
+            c = source[i_src - 1]
+            if c not in substitution_weights:
+                weights = np.full(codes.shape, default_substitution_weight)
+                for (a, b), weight in special_substitution_weights.items():
+                    if a == c:
+                        weights[codes == ord(b)] = weight
+                weights[codes == ord(c)] = match_weight
+                substitution_weights[c] = weights
+
+            current[0] = i_src * deletion_weight
+            np.minimum(
+                previous[:-1] + substitution_weights[c],
+                previous[1:] + deletion_weight,
+                out=current[1:],
+            )
+            for i_tgt in range(1, max_length + 1):
+                np.minimum(
+                    current[i_tgt],
+                    current[i_tgt - 1] + insertion_weight,
+                    out=current[i_tgt],
+                )
+
+            max_additional_score = (l_src - i_src) * (match_weight - insertion_weight)
+            rejected |= (
+                current[lengths, columns] + max_additional_score > threshold
+            ) & (current[last_rows, columns] + max_additional_score > threshold)
+            previous, current = current, previous
+
+        return np.where(
+            rejected, 1.0, previous[lengths, columns] + word_bonus + base_score
+        )
+
+
+class FuzzyTargetBatch:
+    """Padded character code arrays for a list of targets, used by FuzzyMatcher.score_many."""
+
+    def __init__(self, targets: Sequence[str]):
+        targets = list(targets)
+        words = [t.split() for t in targets]
+        self.lengths = np.array([len(t) for t in targets], dtype=np.intp)
+        # Indexed by position first, so each step of the edit distance works on a contiguous row
+        self.codes = _pad_codes(targets).T.copy()
+        self.word_codes = _pad_nested_codes(words)
+        self.abbreviated_word_codes = _pad_nested_codes(
+            [[w[0] + strip_vowels(w[1:]) for w in ws] for ws in words]
+        )
+        self.unspaced_codes = _pad_codes([strip_spaces(t) for t in targets])
+        self.acronym_codes = _pad_codes(["".join(w[0] for w in ws) for ws in words])
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def take(self, indices: Sequence[int]) -> "FuzzyTargetBatch":
+        indices = np.asarray(indices, dtype=np.intp)
+        batch = FuzzyTargetBatch.__new__(FuzzyTargetBatch)
+        batch.lengths = self.lengths[indices]
+        batch.codes = self.codes[:, indices]
+        batch.word_codes = self.word_codes[indices]
+        batch.abbreviated_word_codes = self.abbreviated_word_codes[indices]
+        batch.unspaced_codes = self.unspaced_codes[indices]
+        batch.acronym_codes = self.acronym_codes[indices]
+        return batch
+
+
+def _to_codes(s: str) -> np.ndarray:
+    return np.array([ord(c) for c in s], dtype=np.int32)
+
+
+def _pad_codes(strings: Sequence[str]) -> np.ndarray:
+    # Padding is negative so it never equals a character
+    codes = np.full((len(strings), max(map(len, strings), default=0)), -1, np.int32)
+    for i, s in enumerate(strings):
+        codes[i, : len(s)] = _to_codes(s)
+    return codes
+
+
+def _pad_nested_codes(nested_strings: Sequence[Sequence[str]]) -> np.ndarray:
+    codes = np.full(
+        (
+            len(nested_strings),
+            max(map(len, nested_strings), default=0),
+            max((len(s) for ss in nested_strings for s in ss), default=0),
+        ),
+        -1,
+        np.int32,
+    )
+    for i, strings in enumerate(nested_strings):
+        for j, s in enumerate(strings):
+            codes[i, j, : len(s)] = _to_codes(s)
+    return codes
+
+
+class FuzzyCandidateIndex:
+    """An inverted character index used to shortlist keys before fuzzy scoring.
+
+    Since insertions are nearly free, a query may match any subsequence of a key,
+    so the index counts shared characters rather than longer n-grams.
+    Characters with a non-positive substitution weight between them are treated as the same.
+    """
+
+    def __init__(self, config: "FuzzyMatchConfig"):
+        self.config = config
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._canonical: Dict[str, str] = {}
+        for (a, b), weight in config.special_substitution_weights.items():
+            if weight <= 0:
+                root_a = self._canonical_char(a)
+                root_b = self._canonical_char(b)
+                if root_a != root_b:
+                    self._canonical[root_b] = root_a
+        self._canonical = {c: self._canonical_char(c) for c in self._canonical}
+
+    def _canonical_char(self, c: str) -> str:
+        while c in self._canonical:
+            c = self._canonical[c]
+        return c
+
+    def _counts(self, key: str) -> Counter:
+        canonical = self._canonical
+        return Counter(canonical.get(c, c) for c in key)
+
+    def add(self, key: str):
+        for c, count in self._counts(key).items():
+            self._postings[c][key] = count
+
+    def remove(self, key: str):
+        for c in self._counts(key):
+            self._postings[c].pop(key, None)
+
+    def minimum_overlap(self, length: int) -> Optional[float]:
+        """Returns the number of shared characters a key needs to possibly score at most zero
+        against a query of the given length, or None if no such bound can be derived.
+
+        Each query character either pairs with a shared character, costing at least the match weight
+        and contributing at most one to the word bonuses, or costs at least the smallest positive
+        substitution or deletion weight.
+        """
+        config = self.config
+        if config.insertion_weight < 0:
+            return None
+        unmatched_cost = min(
+            config.deletion_weight,
+            config.default_substitution_weight,
+            *(w for w in config.special_substitution_weights.values() if w > 0),
+        )
+        matched_cost = min(
+            config.match_weight,
+            *(w for w in config.special_substitution_weights.values() if w <= 0),
+        )
+        bonus_weight = min(
+            config.word_match_weight,
+            config.whole_match_weight,
+            config.acronym_match_weight,
+            0,
+        )
+        gain = unmatched_cost - matched_cost - bonus_weight
+        if unmatched_cost <= 0 or gain <= 0:
+            return None
+        return (unmatched_cost * length + config.base_score) / gain
+
+    def candidates(self, key: str) -> Optional[Set[str]]:
+        """Returns the keys that may score at most zero against the given query,
+        or None if every key should be considered."""
+        required = self.minimum_overlap(len(key))
+        if required is None or required <= 0:
+            return None
+        required -= 1e-9
+        overlaps = defaultdict(int)
+        for c, query_count in self._counts(key).items():
+            for k, count in self._postings.get(c, {}).items():
+                overlaps[k] += min(query_count, count)
+        return {k for k, overlap in overlaps.items() if overlap >= required}
+
 
 def strip_spaces(s):
     return re.sub(" ", "", s)
@@ -255,8 +553,7 @@ def normalize(input_str):
     return "".join([c for c in nfkd_form if not unicodedata.combining(c)])
 
 
-def romanize(s: str) -> str:
-    s = str(s)
+def _romanize(s: str) -> str:
     s = normalize(s)
     s = re.sub("['・]", "", s)
     s = re.sub("[A-Za-z]+", lambda ele: f" {ele[0]} ", s)
@@ -264,3 +561,45 @@ def romanize(s: str) -> str:
     s = " ".join(c["hepburn"].strip().lower() for c in _kks.convert(s))
     s = re.sub(r"[^a-zA-Z0-9_ ]+", "", s)
     return " ".join(s.split())
+
+
+@functools.lru_cache(maxsize=4096)
+def romanize(s: str) -> str:
+    return _romanize(str(s))
+
+
+# Romanized master names, persisted so startup only needs to run pykakasi for new names.
+# Unlike the lru_cache on romanize, this is unbounded, so it should not be used for user input.
+_key_romanizations: Dict[str, str] = {}
+_used_key_romanizations: Set[str] = set()
+_ROMANIZATION_CACHE_VERSION = f"1-{importlib.metadata.version('pykakasi')}"
+
+
+def romanize_key(s: str) -> str:
+    s = str(s)
+    _used_key_romanizations.add(s)
+    if (result := _key_romanizations.get(s)) is None:
+        result = _key_romanizations[s] = _romanize(s)
+    return result
+
+
+def load_romanization_cache(path: Path):
+    try:
+        with Path(path).open(encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    if data.get("version") == _ROMANIZATION_CACHE_VERSION:
+        _key_romanizations.update(data["entries"])
+
+
+def save_romanization_cache(path: Path):
+    """Saves the romanizations of keys used since the last save, dropping names no longer in the masters."""
+    entries = {k: _key_romanizations[k] for k in _used_key_romanizations}
+    _used_key_romanizations.clear()
+    with Path(path).open("w", encoding="utf-8") as f:
+        json.dump(
+            {"version": _ROMANIZATION_CACHE_VERSION, "entries": entries},
+            f,
+            ensure_ascii=False,
+        )
@@ -0,0 +1,77 @@
+import logging
+import timeit
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Optional
+
+import discord
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ImageEncoding:
+    """How generated images are encoded before being uploaded.
+
+    Formats are "png", "webp" (lossless) and "png_palette" (quantized to 256 colors).
+    """
+
+    format: str = "png"
+    # Wider images are scaled down to this width
+    max_width: Optional[int] = 2048
+    # For png, 1 is much faster than the default of 6 and only slightly larger
+    compress_level: int = 1
+
+    extensions = {"png": "png", "webp": "webp", "png_palette": "png"}
+
+    def __post_init__(self):
+        if self.format not in self.extensions:
+            raise ValueError(f"Unknown image format {self.format}.")
+
+    @property
+    def extension(self) -> str:
+        return self.extensions[self.format]
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    data: bytes
+    extension: str
+    width: int
+    height: int
+
+    def filename(self, name: str) -> str:
+        return f"{name}.{self.extension}"
+
+    def to_file(self, name: str) -> discord.File:
+        return discord.File(fp=BytesIO(self.data), filename=self.filename(name))
+
+
+def encode_image(image: Image.Image, encoding: ImageEncoding) -> EncodedImage:
+    """Scales down and encodes an image. Blocking, should be run in an executor."""
+    start_time = timeit.default_timer()
+    source_size = image.size
+    if encoding.max_width and image.width > encoding.max_width:
+        height = round(image.height * encoding.max_width / image.width)
+        image = image.resize(
+            (encoding.max_width, height),
+            Image.Resampling.LANCZOS,
+            reducing_gap=2.0,
+        )
+    buffer = BytesIO()
+    if encoding.format == "webp":
+        image.save(buffer, "webp", lossless=True, method=1)
+    elif encoding.format == "png_palette":
+        image.quantize(256, method=Image.Quantize.FASTOCTREE).save(
+            buffer, "png", compress_level=encoding.compress_level
+        )
+    else:
+        image.save(buffer, "png", compress_level=encoding.compress_level)
+    data = buffer.getvalue()
+    logger.info(
+        f"Encoded {source_size[0]}x{source_size[1]} image as "
+        f"{image.width}x{image.height} {encoding.format} ({len(data):,} bytes) in "
+        f"{timeit.default_timer() - start_time:.3f}s."
+    )
+    return EncodedImage(data, encoding.extension, image.width, image.height)
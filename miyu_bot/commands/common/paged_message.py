@@ -1,4 +1,5 @@
-from typing import List, Iterable, Set, Optional
+import functools
+from typing import List, Iterable, Set, Optional, Sequence, Callable
 
 import discord
 from discord import SelectOption, Interaction
@@ -34,6 +35,7 @@ async def run_paged_message(
 
     entries = [*entries]
     max_item_number_length = len(str(len(entries)))
+    page_count = (len(entries) + page_size - 1) // page_size
 
     def format_entry(number, entry):
         if numbered:
@@ -41,25 +43,21 @@ async def run_paged_message(
         else:
             return f"`{entry}`"
 
-    entries = [format_entry(i, entry) for i, entry in enumerate(entries, 1)]
-    paged_entries = [
-        entries[i : i + page_size] for i in range(0, len(entries), page_size)
-    ]
-
-    embeds = [
-        discord.Embed.from_dict(
+    def build_page(page_index):
+        start = page_index * page_size
+        page = [
+            format_entry(i, entry)
+            for i, entry in enumerate(entries[start : start + page_size], start + 1)
+        ]
+        return discord.Embed.from_dict(
             {
                 **base_embed.to_dict(),
                 "description": header + "\n".join(page),
             }
-        ).set_footer(text=f"Page {i + 1}/{len(paged_entries)}")
-        for i, page in enumerate(paged_entries)
-    ]
+        ).set_footer(text=f"Page {page_index + 1}/{page_count}")
 
-    page_titles = [
-        f"Page {i + 1}. #{i * page_size + 1}-{i * page_size + len(page)}"
-        for i, page in enumerate(paged_entries)
-    ]
+    embeds = LazyPages(page_count, build_page)
+    page_titles = get_page_titles(len(entries), page_size)
 
     await ctx.send(
         embed=embeds[start_page],
@@ -74,6 +72,41 @@ async def run_paged_message(
     )
 
 
+def get_page_titles(entry_count: int, page_size: int) -> List[str]:
+    return [
+        f"Page {i + 1}. #{start + 1}-{min(start + page_size, entry_count)}"
+        for i, start in enumerate(range(0, entry_count, page_size))
+    ]
+
+
+class LazyPages(Sequence[discord.Embed]):
+    """A sequence of page embeds that are only built when first accessed.
+
+    Only the most recently used pages are kept.
+    """
+
+    def __init__(
+        self,
+        page_count: int,
+        build_page: Callable[[int], discord.Embed],
+        memo_size: int = 8,
+    ):
+        self.page_count = page_count
+        self._get_page = functools.lru_cache(maxsize=memo_size)(build_page)
+
+    def __len__(self):
+        return self.page_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.page_count))]
+        if index < 0:
+            index += self.page_count
+        if not 0 <= index < self.page_count:
+            raise IndexError("Page index out of range.")
+        return self._get_page(index)
+
+
 class PageChangeButton(discord.ui.Button["PagedMessageView"]):
     def __init__(
         self,
@@ -134,7 +167,7 @@ class PageSelect(discord.ui.Select["PagedMessageView"]):
 class PagedMessageView(UserRestrictedView):
     def __init__(
         self,
-        embeds: List[discord.Embed],
+        embeds: Sequence[discord.Embed],
         *,
         page_titles: Optional[List[str]] = None,
         start_index: int = 0,
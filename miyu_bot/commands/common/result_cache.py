@@ -0,0 +1,132 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import numpy as np
+
+
+class ResultCache:
+    """An LRU cache bounded by entry count and/or approximate size, with an optional time to live.
+
+    Entries can be stored with a version, in which case they are only
+    returned when looked up with the same version object.
+    """
+
+    _missing = object()
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = 256,
+        ttl: Optional[float] = None,
+        maxbytes: Optional[int] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self._entries = OrderedDict()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, version: Any = None, default=None):
+        entry = self._entries.get(key, self._missing)
+        if entry is not self._missing:
+            expires_at, entry_version, value, _size = entry
+            if entry_version is version and (
+                expires_at is None or time.monotonic() < expires_at
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._remove(key)
+        self.misses += 1
+        return default
+
+    def put(
+        self, key: Hashable, value, version: Any = None, size: Optional[int] = None
+    ):
+        """Stores a value.
+
+        If the cache has a byte budget and no size is given,
+        the size is estimated with approximate_size.
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        if self.maxbytes is None:
+            size = 0
+        elif size is None:
+            size = approximate_size(value)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, version, value, size)
+        self.resident_bytes += size
+        while self._entries and (
+            (self.maxsize is not None and len(self._entries) > self.maxsize)
+            or (self.maxbytes is not None and self.resident_bytes > self.maxbytes)
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        self.resident_bytes -= self._entries.pop(key)[3]
+
+    def clear(self):
+        self._entries.clear()
+        self.resident_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> str:
+        size = f"{len(self)}/{self.maxsize}" if self.maxsize is not None else len(self)
+        stats = (
+            f"size: {size}, hits: {self.hits}, misses: {self.misses}, "
+            f"hit rate: {self.hit_rate:.1%}, evictions: {self.evictions}"
+        )
+        if self.maxbytes is not None:
+            stats += (
+                f", resident: {self.resident_bytes / 2 ** 20:.1f}"
+                f"/{self.maxbytes / 2 ** 20:.0f} MiB"
+            )
+        return stats
+
+
+def approximate_size(obj, exclude=()) -> int:
+    """Roughly estimates the memory used by an object and everything it references.
+
+    Objects in exclude (and anything only reachable through them) are not counted,
+    which is useful for not counting data shared with other cache entries.
+    """
+    seen = {id(o) for o in exclude}
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, type):
+            continue
+        seen.add(id(o))
+        if isinstance(o, np.ndarray):
+            total += sys.getsizeof(o) + (o.nbytes if o.base is None else 0)
+            continue
+        total += sys.getsizeof(o)
+        if isinstance(o, (str, bytes, bytearray, int, float, bool)):
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        if hasattr(o, "__dict__"):
+            stack.append(o.__dict__)
+        for cls in type(o).__mro__:
+            slots = cls.__dict__.get("__slots__", ())
+            for slot in (slots,) if isinstance(slots, str) else slots:
+                if hasattr(o, slot):
+                    stack.append(getattr(o, slot))
+    return total
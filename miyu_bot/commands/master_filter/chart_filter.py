@@ -1,8 +1,11 @@
 import asyncio
-import itertools
+import logging
 import re
+import timeit
 from datetime import datetime
+from typing import Dict, Optional, Tuple
 
+import numpy as np
 from d4dj_utils.master.chart_master import ChartMaster, ChartDifficulty
 from d4dj_utils.master.skill_master import SkillMaster
 
@@ -21,8 +24,20 @@ from miyu_bot.commands.master_filter.master_filter import (
 class ChartFilter(MasterFilter[ChartMaster]):
     def __init__(self, bot: MiyuBot, master_name: str, name: str):
         super().__init__(bot, master_name, name)
+        self.logger = logging.getLogger(__name__)
         self.reference_chart = self.bot.assets[Server.JP].chart_master[3200094]
-        self.bot.setup_tasks.append(self.preload_song_scores())
+        # Scores of each chart (rows) for each of the score presets (columns)
+        self._score_table: Optional[np.ndarray] = None
+        self._score_table_rows: Dict[int, int] = {}
+        self._score_table_columns: Dict[Tuple, int] = {
+            preset: i for i, preset in enumerate(self._score_presets)
+        }
+        self._score_table_task: Optional[asyncio.Task] = None
+        if self.bot.is_ready():
+            # Assets were reloaded after startup, so setup tasks won't be run again
+            self.start_score_table_build()
+        else:
+            self.bot.setup_tasks.append(self.preload_song_scores())
 
     def get_name(self, value: ChartMaster) -> str:
         parts = []
@@ -43,6 +58,9 @@ class ChartFilter(MasterFilter[ChartMaster]):
     def is_released(self, value: ChartMaster) -> bool:
         return value.music.is_released
 
+    def get_release_datetime(self, value: ChartMaster) -> Optional[datetime]:
+        return value.music.start_datetime
+
     difficulty_short_names = {
         ChartDifficulty.Easy: "ES",
         ChartDifficulty.Normal: "NM",
@@ -241,7 +259,7 @@ class ChartFilter(MasterFilter[ChartMaster]):
         else:
             return " N/A"
 
-    @data_attribute(name="playable", is_flag=True)
+    @data_attribute(name="playable", is_flag=True, is_volatile=True)
     def playable(self, value: ChartMaster):
         return (
             value.music.is_available
@@ -297,20 +315,79 @@ class ChartFilter(MasterFilter[ChartMaster]):
         skill_duration = skill_duration and float(skill_duration) or 9
         return f"{self.get_chart_score_formatted(value, score, skill_duration, 0.0, fever=False)}  {self.format_song_duration(value)} "
 
-    _score_cache_keys = {
-        *itertools.product([0, 20, 25, 30, 35, 40, 45, 50, 55, 60], [True, False])
-    }
+    # (score up, skill duration, fever multiplier, fever) for the default durations
+    # and common score ups, as passed by the score attributes and formatters
+    _score_presets = [
+        (float(score_up), 9.0, fever_multiplier, fever)
+        for score_up in [0, 20, 25, 30, 35, 40, 45, 50, 55, 60]
+        for fever_multiplier, fever in [(1.0, True), (0.0, True), (0.0, False)]
+    ]
 
     async def preload_song_scores(self):
-        pass
+        self.start_score_table_build()
+
+    def start_score_table_build(self):
+        # Runs in the background so it doesn't hold up startup,
+        # scores are calculated on demand in the meantime
+        self._score_table_task = asyncio.create_task(self.build_score_table())
+        self._score_table_task.add_done_callback(self._on_score_table_build_done)
+
+    def cancel_score_table_build(self):
+        if self._score_table_task is not None:
+            self._score_table_task.cancel()
+
+    def _on_score_table_build_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error(
+                "Failed to build chart score table.", exc_info=task.exception()
+            )
+
+    async def build_score_table(self):
+        start_time = timeit.default_timer()
+        charts = list(self.bot.chart_scorer.chart_masters.values())
+        try:
+            table = await self.bot.chart_scoring_engine.score_table(
+                charts,
+                [
+                    (
+                        [self.get_dummy_skill_fields(score_up, duration)] * 5,
+                        dict(fever_score_up=fever_multiplier, enable_fever=fever),
+                    )
+                    for score_up, duration, fever_multiplier, fever in (
+                        self._score_presets
+                    )
+                ],
+                150000,
+            )
+        except Exception:
+            # Most likely the scoring engine was shut down by an asset reload
+            self.logger.warning("Failed to build chart score table.", exc_info=True)
+            return
+        self._score_table_rows = {chart.id: i for i, chart in enumerate(charts)}
+        self._score_table = table
+        self.logger.info(
+            f"Built score table for {len(charts)} charts and "
+            f"{len(self._score_presets)} presets in {timeit.default_timer() - start_time:.2f}s."
+        )
 
     def get_chart_score(
         self, chart: ChartMaster, score, skill_duration, fever_multiplier, fever
     ) -> float:
+        if self._score_table is not None:
+            column = self._score_table_columns.get(
+                (score, skill_duration, fever_multiplier, fever)
+            )
+            row = self._score_table_rows.get(chart.id)
+            if column is not None and row is not None:
+                return float(self._score_table[row, column])
         skills = [self.get_dummy_skill(score, skill_duration)] * 5
-        return self.bot.chart_scorer.score(
-            chart, 150000, skills, fever_multiplier, fever
-        )
+        return self.bot.chart_scorer.score_batch(
+            chart,
+            150000,
+            [skills],
+            fever_score_up=fever_multiplier,
+            enable_fever=fever,
+        )[0]
 
     def get_chart_score_formatted(
         self, chart, score, skill_duration, fever_multiplier, fever
@@ -324,7 +401,12 @@ class ChartFilter(MasterFilter[ChartMaster]):
 
     def get_dummy_skill(self, score, duration):
         return SkillMaster(
-            self.bot.assets[Server.JP],
+            self.bot.assets[Server.JP], **self.get_dummy_skill_fields(score, duration)
+        )
+
+    @staticmethod
+    def get_dummy_skill_fields(score, duration):
+        return dict(
             id=0,
             min_recovery_value=0,
             max_recovery_value=0,
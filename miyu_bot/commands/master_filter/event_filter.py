@@ -39,6 +39,9 @@ class EventFilter(MasterFilter[EventMaster]):
             hours=1
         )
 
+    def get_release_datetime(self, value: EventMaster) -> Optional[dt.datetime]:
+        return value.start_datetime - dt.timedelta(hours=1)
+
     def get_current(
         self, ctx: Union[PrefContext, Server, None]
     ) -> Optional[EventMaster]:
@@ -203,7 +206,8 @@ class EventFilter(MasterFilter[EventMaster]):
     @command_source(
         command_args=dict(
             name="event", description="Displays event info.", help="!event cooking"
-        )
+        ),
+        is_volatile=True,
     )
     def get_event_embed(self, ctx, event: EventMaster, server):
         l10n = self.l10n[ctx]
@@ -1,3 +1,6 @@
+import copy
+import logging
+import timeit
 from typing import List, Optional, TYPE_CHECKING, Union, Callable, Coroutine, Set
 
 import discord
@@ -19,6 +22,8 @@ if TYPE_CHECKING:
         MasterFilter,
     )
 
+logger = logging.getLogger(__name__)
+
 
 class DetailTabButton(discord.ui.Button["FilterDetailView"]):
     def __init__(self, tab: int, style=discord.ButtonStyle.primary, **kwargs):
@@ -178,13 +183,6 @@ class FilterDetailView(UserRestrictedView):
                 self._tab = source_info.default_tab
         else:
             self._tab = None
-        self.active_embed = self.embed_source(
-            master_filter,
-            ctx,
-            self.values[self.page_index],
-            self.tab,
-            ctx.preferences.server,
-        )
 
         self.tab_buttons = []
         if (tabs := source_info.tabs) is not None:
@@ -290,11 +288,46 @@ class FilterDetailView(UserRestrictedView):
             is not None
         )
 
+    @property
+    def active_embed(self) -> discord.Embed:
+        value = self.active_value
+        start_time = timeit.default_timer()
+        if self.source_info.is_volatile:
+            embed = self.embed_source(
+                self.master_filter, self.ctx, value, self.tab, self.server
+            )
+            cached = False
+        else:
+            preferences = self.ctx.preferences
+            key = (
+                self.master_filter.name,
+                self.source_info.embed_source,
+                value.id,
+                self.tab,
+                self.server,
+                bool(preferences.leaks),
+                preferences.language,
+                str(preferences.timezone),
+            )
+            embed_data = self.ctx.bot.embed_cache.get(key)
+            cached = embed_data is not None
+            if not cached:
+                embed = self.embed_source(
+                    self.master_filter, self.ctx, value, self.tab, self.server
+                )
+                embed_data = embed.to_dict()
+                self.ctx.bot.embed_cache.put(key, embed_data)
+            # Copied so changes to the returned embed don't affect the cached data
+            embed = discord.Embed.from_dict(copy.deepcopy(embed_data))
+        logger.debug(
+            f"Rendered {self.master_filter.name} {value.id} tab {self.tab} "
+            f"({'cached' if cached else 'uncached'}) in "
+            f"{(timeit.default_timer() - start_time) * 1000:.2f}ms."
+        )
+        return embed
+
     def update(self):
         value = self.values[self.page_index]
-        self.active_embed = self.embed_source(
-            self.master_filter, self.ctx, value, self.tab, self.server
-        )
         self.prev_button.disabled = self._page_index == 0
         self.large_decr_button.disabled = self._page_index == 0
         self.small_decr_button.disabled = self._page_index == 0
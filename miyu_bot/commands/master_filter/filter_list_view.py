@@ -5,7 +5,11 @@ from discord import Interaction, SelectOption
 
 from miyu_bot.bot.bot import PrefContext
 from miyu_bot.bot.models import log_usage
-from miyu_bot.commands.common.paged_message import PagedMessageView
+from miyu_bot.commands.common.paged_message import (
+    PagedMessageView,
+    LazyPages,
+    get_page_titles,
+)
 from miyu_bot.commands.master_filter import filter_detail_view
 from miyu_bot.commands.master_filter.filter_result import FilterResults
 
@@ -40,9 +44,6 @@ class FilterListView(PagedMessageView):
         self.ctx = ctx
         self.base_results = results
         self.values = results.values
-        self.select_option_details = [
-            self.master_filter.get_select_name(v) for v in self.values
-        ]
         self.page_size = 20
 
         if results.list_title:
@@ -53,44 +54,14 @@ class FilterListView(PagedMessageView):
             base_embed = discord.Embed(
                 title=f'[{ctx.preferences.server.name}] {self.master_filter.l10n[ctx].format_value(self.master_filter.list_formatter.name or "search")}',
             )
-        display_formatter = results.display_formatter
-        if display_formatter:
-            entries = [
-                f"{display_formatter(self.master_filter, self.ctx, value)} {self.master_filter.list_formatter(self.master_filter, self.ctx, value)}"
-                for value in self.values
-            ]
-        else:
-            entries = [
-                self.master_filter.list_formatter(self.master_filter, self.ctx, value)
-                for value in self.values
-            ]
-
-        max_item_number_length = len(str(len(entries)))
-
-        def format_entry(number, entry):
-            return f'`{number}.{" " * (max_item_number_length - len(str(number)))} {entry}`'
-
-        entries = [format_entry(i, entry) for i, entry in enumerate(entries, 1)]
-
-        paged_entries = [
-            entries[i : i + self.page_size]
-            for i in range(0, len(entries), self.page_size)
-        ]
+        self.base_embed_data = base_embed.to_dict()
+        self.display_formatter = results.display_formatter
+        self.max_item_number_length = len(str(len(self.values)))
+        page_count = (len(self.values) + self.page_size - 1) // self.page_size
 
-        embeds = [
-            discord.Embed.from_dict(
-                {
-                    **base_embed.to_dict(),
-                    "description": "\n".join(page),
-                }
-            ).set_footer(text=f"Page {i + 1}/{len(paged_entries)}")
-            for i, page in enumerate(paged_entries)
-        ]
-
-        page_titles = [
-            f"Page {i + 1}. #{i * self.page_size + 1}-{i * self.page_size + len(page)}"
-            for i, page in enumerate(paged_entries)
-        ]
+        # Entries are only formatted for pages that are actually shown
+        embeds = LazyPages(page_count, self.build_page)
+        page_titles = get_page_titles(len(self.values), self.page_size)
 
         self.item_select = FilterListItemSelect(placeholder="Details", row=3)
         super(FilterListView, self).__init__(
@@ -107,6 +78,29 @@ class FilterListView(PagedMessageView):
         self.add_item(self.item_select)
         self.set_item_index(results.start_index)
 
+    def format_entry(self, number, value):
+        entry = self.master_filter.list_formatter(self.master_filter, self.ctx, value)
+        if self.display_formatter:
+            display = self.display_formatter(self.master_filter, self.ctx, value)
+            entry = f"{display} {entry}"
+        padding = " " * (self.max_item_number_length - len(str(number)))
+        return f"`{number}.{padding} {entry}`"
+
+    def build_page(self, page_index: int) -> discord.Embed:
+        start = page_index * self.page_size
+        page = [
+            self.format_entry(i, value)
+            for i, value in enumerate(
+                self.values[start : start + self.page_size], start + 1
+            )
+        ]
+        return discord.Embed.from_dict(
+            {
+                **self.base_embed_data,
+                "description": "\n".join(page),
+            }
+        ).set_footer(text=f"Page {page_index + 1}/{len(self.embeds)}")
+
     def set_item_index(self, value):
         self.page_index = value // self.page_size
 
@@ -116,18 +110,20 @@ class FilterListView(PagedMessageView):
         self.item_select.options = self.get_item_select_options()
 
     def get_item_select_options(self):
-        return [
-            SelectOption(
-                label=f"{i + 1}. {self.select_option_details[i][0]}",
-                description=self.select_option_details[i][1],
-                emoji=self.select_option_details[i][2],
-                value=str(i),
+        options = []
+        for i in range(
+            self.page_index * self.page_size,
+            min(len(self.values), (self.page_index + 1) * self.page_size),
+        ):
+            name, description, emoji = self.master_filter.get_select_name(
+                self.values[i]
             )
-            for i in range(
-                self.page_index * self.page_size,
-                min(
-                    len(self.select_option_details),
-                    (self.page_index + 1) * self.page_size,
-                ),
+            options.append(
+                SelectOption(
+                    label=f"{i + 1}. {name}",
+                    description=description,
+                    emoji=emoji,
+                    value=str(i),
+                )
             )
-        ]
+        return options
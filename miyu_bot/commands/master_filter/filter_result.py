@@ -1,13 +1,18 @@
 import dataclasses
 import functools
 import re
+import timeit
+from collections import Counter
 from dataclasses import dataclass
-from typing import List, Optional, TYPE_CHECKING, Callable
+from typing import List, Optional, TYPE_CHECKING, Callable, Dict, Sequence, Any
+
+import numpy as np
 
 from miyu_bot.bot.servers import Server
 from miyu_bot.commands.common.argument_parsing import (
     list_to_list_operator_for,
     list_operator_for,
+    operator_for,
     ParsedArguments,
     ArgumentError,
 )
@@ -30,6 +35,126 @@ class FilterResults:
     start_tab_name: Optional[str] = None
     display_formatter: Optional["Callable"] = None
     list_title: Optional[str] = None
+    explanation: Optional[str] = None
+    # Whether the results only depend on the arguments, preferences and released masters
+    is_cacheable: bool = True
+
+
+@dataclass
+class FilterPredicate:
+    description: str
+    attr: "DataAttributeInfo"
+    predicate: Optional[Callable[[Any], bool]] = None
+    array_predicate: Optional[Callable[[np.ndarray], np.ndarray]] = None
+    # Flag callbacks filter the whole list at once instead of using a predicate
+    callback: Optional[Callable] = None
+    invert: bool = False
+    selectivity: Optional[float] = None
+
+    @property
+    def is_cached(self):
+        return self.attr.is_cacheable and self.callback is None
+
+    def test(self, value) -> bool:
+        return bool(self.predicate(value)) != self.invert
+
+    def test_array(self, array: np.ndarray) -> np.ndarray:
+        mask = self.array_predicate(array)
+        return ~mask if self.invert else mask
+
+
+class DataAttributeTable:
+    """Column store of cacheable data attribute values for the masters of one server.
+
+    Columns are computed on first use and indexed by position in the master list.
+    Numeric columns are additionally available as NumPy arrays.
+    """
+
+    def __init__(self, master_filter: "MasterFilter", masters: Sequence):
+        self.master_filter = master_filter
+        self.masters = list(masters)
+        self.positions = {id(v): i for i, v in enumerate(self.masters)}
+        self.columns: Dict[str, List[Any]] = {}
+        self.arrays: Dict[str, Optional[np.ndarray]] = {}
+        self.histograms: Dict[str, Optional[Counter]] = {}
+
+    def indices(self, values: Sequence) -> Optional[np.ndarray]:
+        positions = self.positions
+        try:
+            return np.fromiter(
+                (positions[id(v)] for v in values), dtype=np.intp, count=len(values)
+            )
+        except KeyError:
+            return None
+
+    def column(self, attr: "DataAttributeInfo") -> List[Any]:
+        column = self.columns.get(attr.name)
+        if column is None:
+            column = self.columns[attr.name] = [
+                attr.accessor(self.master_filter, None, v) for v in self.masters
+            ]
+        return column
+
+    def array(self, attr: "DataAttributeInfo") -> Optional[np.ndarray]:
+        if attr.name not in self.arrays:
+            self.arrays[attr.name] = None
+            column = self.column(attr)
+            if not attr.is_plural and all(_is_number(v) for v in column):
+                is_float = any(isinstance(v, float) for v in column)
+                try:
+                    self.arrays[attr.name] = np.array(
+                        column, dtype=np.float64 if is_float else np.int64
+                    )
+                except OverflowError:
+                    pass
+        return self.arrays[attr.name]
+
+    def histogram(self, attr: "DataAttributeInfo") -> Optional[Counter]:
+        if attr.name not in self.histograms:
+            try:
+                self.histograms[attr.name] = Counter(self.column(attr))
+            except TypeError:
+                # Unhashable values
+                self.histograms[attr.name] = None
+        return self.histograms[attr.name]
+
+    def estimate_selectivity(self, predicate: "FilterPredicate") -> Optional[float]:
+        """Returns the fraction of all masters the predicate keeps."""
+        if not self.masters:
+            return None
+        if predicate.array_predicate:
+            array = self.array(predicate.attr)
+            if array is not None:
+                return float(np.mean(predicate.test_array(array)))
+        histogram = self.histogram(predicate.attr)
+        if histogram is None:
+            return None
+        kept = sum(n for value, n in histogram.items() if predicate.test(value))
+        return kept / len(self.masters)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float))
+
+
+def _is_disjoint(targets, value) -> bool:
+    return targets.isdisjoint(value)
+
+
+def _array_truthiness(array: np.ndarray) -> np.ndarray:
+    return array != 0
+
+
+def _array_list_operator(operation: str, array: np.ndarray, targets) -> np.ndarray:
+    # Vectorized equivalent of list_operator_for(operation)
+    # "=" matches any of the targets, every other operator has to hold for all of them
+    operator = operator_for(operation)
+    combine = np.logical_or if operation == "=" else np.logical_and
+    return functools.reduce(
+        combine,
+        (operator(array, target) for target in targets),
+        np.full(len(array), operation != "="),
+    )
 
 
 class FilterProcessor:
@@ -83,7 +208,7 @@ class FilterProcessor:
                 return attr
         raise ArgumentError(f"Invalid sort or display argument: {arg}.")
 
-    def get(self, arg: ParsedArguments, ctx) -> FilterResults:
+    def get(self, arg: ParsedArguments, ctx, explain: bool = False) -> FilterResults:
         start_index = 0
         display = None
         sort = None
@@ -170,71 +295,69 @@ class FilterProcessor:
                     start_tab = words[-1].lower()
                     text = " ".join(words[:-1])
 
-        values = self.master_filter.get_by_relevance(text, ctx)
+        explanation = [] if explain else None
+        stage_start = timeit.default_timer()
 
+        if text:
+            values = self.master_filter.get_by_relevance(text, ctx)
+        else:
+            # Nothing to rank, so skip fuzzy matching altogether
+            values = list(self.master_filter.values(ctx))
+        if explanation is not None:
+            explanation.append(
+                self._explain_stage(
+                    "relevance" if text else "all", None, None, values, stage_start
+                )
+            )
+
+        predicates = []
         for attr, tags in tag_arguments.items():
             if tags:
                 targets = {attr.value_mapping[t] for t in tags}
-                if attr.is_plural:
-                    values = [
-                        v
-                        for v in values
-                        if targets.issubset(attr.accessor(self.master_filter, ctx, v))
-                    ]
-                else:
-                    values = [
-                        v
-                        for v in values
-                        if attr.accessor(self.master_filter, ctx, v) in targets
-                    ]
+                predicates.append(self._tag_predicate(attr, targets))
         for attr, tags in inverse_tag_arguments.items():
             if tags:
                 targets = {attr.value_mapping[t[1:]] for t in tags}
                 if attr.is_plural:
-                    values = [
-                        v
-                        for v in values
-                        if not targets.intersection(
-                            attr.accessor(self.master_filter, ctx, v)
+                    predicates.append(
+                        FilterPredicate(
+                            f"{attr.name} disjoint {targets}",
+                            attr,
+                            functools.partial(_is_disjoint, targets),
                         )
-                    ]
+                    )
                 else:
-                    values = [
-                        v
-                        for v in values
-                        if attr.accessor(self.master_filter, ctx, v) not in targets
-                    ]
+                    predicates.append(
+                        FilterPredicate(
+                            f"{attr.name} not in {targets}",
+                            attr,
+                            targets.__contains__,
+                            self._array_membership(targets),
+                            invert=True,
+                        )
+                    )
         for attr, tags in keyword_arguments.items():
             if tags:
                 targets = {attr.value_mapping[t] for t in tags}
-                if attr.is_plural:
-                    values = [
-                        v
-                        for v in values
-                        if targets.issubset(attr.accessor(self.master_filter, ctx, v))
-                    ]
-                else:
-                    values = [
-                        v
-                        for v in values
-                        if attr.accessor(self.master_filter, ctx, v) in targets
-                    ]
+                predicates.append(self._tag_predicate(attr, targets))
         for attr, flag_present in flag_arguments.items():
             if flag_present:
                 if attr.flag_callback:
-                    callback_value = attr.flag_callback(self.master_filter, ctx, values)
-                    if callback_value is not None:
-                        values = callback_value
+                    predicates.append(
+                        FilterPredicate(attr.name, attr, callback=attr.flag_callback)
+                    )
                 else:
-                    values = [
-                        v for v in values if attr.accessor(self.master_filter, ctx, v)
-                    ]
+                    predicates.append(
+                        FilterPredicate(attr.name, attr, bool, _array_truthiness)
+                    )
         for attr, flag_present in inverse_flag_arguments.items():
             if flag_present:
                 # Flags with callbacks are excluded
-                values = [
-                    v for v in values if not attr.accessor(self.master_filter, ctx, v)
-                ]
+                predicates.append(
+                    FilterPredicate(
+                        f"!{attr.name}", attr, bool, _array_truthiness, invert=True
+                    )
+                )
         for attr, arguments in {**comparable_arguments, **eq_arguments}.items():
             for argument in arguments:
                 argument_value, operation = argument
@@ -242,35 +365,48 @@ class FilterProcessor:
                     operator = list_to_list_operator_for(operation)
                 else:
                     operator = list_operator_for(operation)
-                values = [
-                    v
-                    for v in values
-                    if operator(
-                        attr.accessor(self.master_filter, ctx, v), argument_value
+                array_predicate = None
+                if not attr.is_plural and all(_is_number(v) for v in argument_value):
+                    array_predicate = functools.partial(
+                        _array_list_operator, operation, targets=argument_value
                     )
-                ]
+                predicates.append(
+                    FilterPredicate(
+                        f"{attr.name} {operation} {argument_value}",
+                        attr,
+                        functools.partial(operator, b=argument_value),
+                        array_predicate,
+                    )
+                )
 
+        for predicate in self.plan(ctx, predicates):
+            stage_start = timeit.default_timer()
+            count = len(values)
+            values = self._apply(ctx, values, predicate)
+            if explanation is not None:
+                explanation.append(
+                    self._explain_stage(
+                        predicate.description, predicate, count, values, stage_start
+                    )
+                )
+
+        stage_start = timeit.default_timer()
         if self.master_filter.default_sort and not text:
-            values = sorted(
-                values,
-                key=lambda v: self.master_filter.default_sort.accessor(
-                    self.master_filter, ctx, v
-                ),
-            )
+            values = self._sorted(ctx, values, self.master_filter.default_sort)
             if self.master_filter.default_sort.reverse_sort ^ bool(
                 sort and reverse_sort
             ):
                 values = values[::-1]
         if sort:
-            values = sorted(
-                values, key=lambda v: sort.accessor(self.master_filter, ctx, v)
-            )
+            values = self._sorted(ctx, values, sort)
         if reverse_sort:
             values = values[::-1]
+        if explanation is not None:
+            explanation.append(
+                self._explain_stage("sort", None, None, values, stage_start)
+            )
 
-        display = display or self.master_filter.default_display
-        if display:
-            display = display.formatter
+        display_attr = display or self.master_filter.default_display
 
         if is_relative_only and current in values:
             start_index = values.index(current)
@@ -305,5 +441,111 @@ class FilterProcessor:
             server=ctx.preferences.server,
             start_index=start_index,
             start_tab_name=start_tab,
-            display_formatter=display,
+            display_formatter=display_attr.formatter if display_attr else None,
+            explanation="\n".join(explanation) if explanation is not None else None,
+            is_cacheable=not is_relative_only
+            and not any(
+                attr is not None and attr.is_volatile
+                for attr in [
+                    *(p.attr for p in predicates),
+                    sort,
+                    display_attr,
+                    self.master_filter.default_sort,
+                ]
+            ),
+        )
+
+    def plan(self, ctx, predicates: List[FilterPredicate]) -> List[FilterPredicate]:
+        """Orders predicates so cached and more selective ones are applied first.
+
+        Predicates only ever remove values without reordering them,
+        so the order they are applied in does not change the result.
+        """
+        table = self.master_filter.get_attribute_table(ctx.preferences.server)
+        for predicate in predicates:
+            if predicate.is_cached:
+                predicate.selectivity = table.estimate_selectivity(predicate)
+        return sorted(
+            predicates,
+            key=lambda p: (
+                not p.is_cached,
+                p.selectivity if p.selectivity is not None else 1.0,
+            ),
+        )
+
+    def _tag_predicate(self, attr: "DataAttributeInfo", targets) -> FilterPredicate:
+        if attr.is_plural:
+            return FilterPredicate(
+                f"{attr.name} superset {targets}", attr, targets.issubset
+            )
+        return FilterPredicate(
+            f"{attr.name} in {targets}",
+            attr,
+            targets.__contains__,
+            self._array_membership(targets),
         )
+
+    @staticmethod
+    def _array_membership(targets):
+        if not all(_is_number(t) for t in targets):
+            return None
+        targets = list(targets)
+        return lambda a: np.isin(a, targets)
+
+    def _apply(self, ctx, values: List, predicate: FilterPredicate) -> List:
+        attr = predicate.attr
+        if predicate.callback:
+            callback_value = predicate.callback(self.master_filter, ctx, values)
+            return values if callback_value is None else callback_value
+        if attr.is_cacheable:
+            table = self.master_filter.get_attribute_table(ctx.preferences.server)
+            indices = table.indices(values)
+            if indices is not None:
+                array = table.array(attr) if predicate.array_predicate else None
+                if array is not None:
+                    mask = predicate.test_array(array[indices])
+                else:
+                    column = table.column(attr)
+                    mask = [predicate.test(column[i]) for i in indices]
+                return [v for v, keep in zip(values, mask) if keep]
+        return [
+            v
+            for v in values
+            if predicate.test(attr.accessor(self.master_filter, ctx, v))
+        ]
+
+    @staticmethod
+    def _explain_stage(
+        name: str,
+        predicate: Optional[FilterPredicate],
+        count: Optional[int],
+        values: List,
+        start_time: float,
+    ) -> str:
+        elapsed = (timeit.default_timer() - start_time) * 1000
+        parts = [f"{name}:"]
+        if count is not None:
+            parts.append(f"{count} -> {len(values)}")
+        else:
+            parts.append(f"{len(values)}")
+        if predicate is not None:
+            parts.append("cached" if predicate.is_cached else "uncached")
+            if predicate.selectivity is not None:
+                parts.append(f"est. {predicate.selectivity:.1%}")
+        parts.append(f"{elapsed:.2f}ms")
+        return " ".join(parts)
+
+    def _sorted(self, ctx, values: List, attr: "DataAttributeInfo") -> List:
+        if attr.is_cacheable:
+            table = self.master_filter.get_attribute_table(ctx.preferences.server)
+            indices = table.indices(values)
+            if indices is not None:
+                array = table.array(attr)
+                if array is not None:
+                    order = np.argsort(array[indices], kind="stable")
+                else:
+                    column = table.column(attr)
+                    keys = [column[i] for i in indices]
+                    order = sorted(range(len(values)), key=keys.__getitem__)
+                return [values[i] for i in order]
+        return sorted(values, key=lambda v: attr.accessor(self.master_filter, ctx, v))
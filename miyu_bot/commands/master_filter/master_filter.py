@@ -5,6 +5,7 @@ Master filter class and related functions.
 from __future__ import annotations
 
 import dataclasses
+import datetime
 import functools
 import re
 import typing
@@ -22,6 +23,7 @@ from typing import (
     Protocol,
     Tuple,
     Awaitable,
+    FrozenSet,
 )
 from typing import TypeVar, Generic, Dict
 
@@ -32,11 +34,18 @@ from discord.ext import commands
 import miyu_bot.bot.bot
 from miyu_bot.bot.bot import MiyuBot, PrefContext
 from miyu_bot.bot.servers import Server
-from miyu_bot.commands.common.argument_parsing import ParsedArguments
-from miyu_bot.commands.common.fuzzy_matching import FuzzyFilteredMap
+from miyu_bot.commands.common.argument_parsing import ParsedArguments, ArgumentError
+from miyu_bot.commands.common.fuzzy_matching import (
+    FuzzyFilteredMap,
+    FuzzyMapSnapshot,
+)
 from miyu_bot.commands.master_filter.filter_detail_view import FilterDetailView
 from miyu_bot.commands.master_filter.filter_list_view import FilterListView
-from miyu_bot.commands.master_filter.filter_result import FilterProcessor, FilterResults
+from miyu_bot.commands.master_filter.filter_result import (
+    FilterProcessor,
+    FilterResults,
+    DataAttributeTable,
+)
 from miyu_bot.commands.master_filter.localization_manager import LocalizationManager
 
 
@@ -88,8 +97,16 @@ class MasterFilter(Generic[TData], metaclass=MasterFilterMeta):
         self.name = name
         self.bot = bot
         self.master_name = master_name
-        self.default_filter = defaultdict(lambda: FuzzyFilteredMap(self.is_released))
+        self.default_filter = defaultdict(
+            lambda: FuzzyFilteredMap(
+                self.is_released, release_time_function=self.get_release_datetime
+            )
+        )
         self.unrestricted_filter = defaultdict(lambda: FuzzyFilteredMap())
+        self._visible_ids: Dict[
+            Tuple[Server, bool], Tuple[FuzzyMapSnapshot, FrozenSet[int]]
+        ] = {}
+        self._attribute_tables: Dict[Server, DataAttributeTable] = {}
         self.command_sources = [dataclasses.replace(c) for c in self._command_sources]
         self.data_attributes = [dataclasses.replace(c) for c in self._data_attributes]
         self.list_formatter = dataclasses.replace(self._list_formatter)
@@ -140,6 +157,15 @@ class MasterFilter(Generic[TData], metaclass=MasterFilterMeta):
                 server = ctx.preferences.server
         return self.bot.assets[server][self.master_name]
 
+    def get_attribute_table(self, server: Server) -> DataAttributeTable:
+        # Filters are recreated when assets are reloaded, which also resets these
+        table = self._attribute_tables.get(server)
+        if table is None:
+            table = self._attribute_tables[server] = DataAttributeTable(
+                self, self.get_asset_source(None, server).values()
+            )
+        return table
+
     def get(
         self, name_or_id: Union[str, int], ctx: Optional[miyu_bot.bot.bot.PrefContext]
     ):
@@ -153,7 +179,7 @@ class MasterFilter(Generic[TData], metaclass=MasterFilterMeta):
         else:
             try:
                 master = self.get_asset_source(ctx)[int(name_or_id)]
-                if master not in self.default_filter[ctx.preferences.server].values():
+                if master.id not in self.get_visible_ids(ctx.preferences.server):
                     master = self.default_filter[ctx.preferences.server][name_or_id]
                 return master
             except (KeyError, ValueError):
@@ -174,7 +200,7 @@ class MasterFilter(Generic[TData], metaclass=MasterFilterMeta):
         else:
             try:
                 master = self.get_asset_source(ctx, server)[master_id]
-                if master not in self.default_filter[server].values():
+                if master.id not in self.get_visible_ids(server):
                     return None
                 return master
             except KeyError:
@@ -184,12 +210,10 @@ class MasterFilter(Generic[TData], metaclass=MasterFilterMeta):
         try:
             master = self.get_asset_source(ctx)[int(name)]
             id_result = [master]
-            if (
-                not ctx.preferences.leaks
-                and master not in self.default_filter[ctx.preferences.server].values()
+            if not ctx.preferences.leaks and master.id not in self.get_visible_ids(
+                ctx.preferences.server
             ):
-                if master not in self.default_filter[ctx.preferences.server].values():
-                    id_result = []
+                id_result = []
         except (KeyError, ValueError):
             id_result = []
 
@@ -216,6 +240,18 @@ class MasterFilter(Generic[TData], metaclass=MasterFilterMeta):
             else:
                 return list(self.default_filter[ctx.preferences.server].values())
 
+    def get_visible_ids(self, server: Server, leaks: bool = False) -> FrozenSet[int]:
+        # Rebuilt only when the underlying filtered map recompiles its snapshot
+        fuzzy_map = (self.unrestricted_filter if leaks else self.default_filter)[server]
+        snapshot = fuzzy_map.snapshot
+        cached = self._visible_ids.get((server, leaks))
+        if cached is None or cached[0] is not snapshot:
+            cached = self._visible_ids[(server, leaks)] = (
+                snapshot,
+                frozenset(v.id for v in snapshot.values),
+            )
+        return cached[1]
+
     def values(
         self, ctx: Optional[Union[miyu_bot.bot.bot.PrefContext, Server]]
     ) -> typing.Iterable[TData]:
@@ -238,6 +274,10 @@ class MasterFilter(Generic[TData], metaclass=MasterFilterMeta):
     def is_released(self, value: TData) -> bool:
         return value.is_released
 
+    def get_release_datetime(self, value: TData) -> Optional[datetime.datetime]:
+        # When is_released is expected to start returning True, if known
+        return getattr(value, "start_datetime", None)
+
     def get_current(self, ctx) -> Optional[TData]:
         return None
 
@@ -298,7 +338,7 @@ class MasterFilter(Generic[TData], metaclass=MasterFilterMeta):
         async def command(ctx, *, arg: Optional[ParsedArguments]):
             await ctx.defer()
             arg = arg or await ParsedArguments.convert(ctx, "")
-            results = filter_processor.get(arg, ctx)
+            results = await self.get_filter_results(filter_processor, arg, ctx)
             if not results.values:
                 await ctx.send("No results.")
                 return
@@ -307,6 +347,59 @@ class MasterFilter(Generic[TData], metaclass=MasterFilterMeta):
 
         return command
 
+    async def get_filter_results(
+        self, filter_processor: FilterProcessor, arg: ParsedArguments, ctx
+    ) -> FilterResults:
+        explain = arg.tag("explain")
+        if explain and not await ctx.bot.is_owner(ctx.author):
+            raise ArgumentError("Privileged tag.")
+        if explain:
+            results = filter_processor.get(arg, ctx, explain=True)
+            await ctx.send(f"```{results.explanation}```")
+            return results
+
+        server = ctx.preferences.server
+        leaks = bool(ctx.preferences.leaks)
+        cache = self.bot.filter_result_cache
+        key = (
+            self.name,
+            filter_processor,  # One per command source
+            server,
+            leaks,
+            arg.normalized(),
+            ctx.preferences.language,
+            str(ctx.preferences.timezone),
+        )
+        # A new snapshot is compiled whenever a master is released
+        version = (self.unrestricted_filter if leaks else self.default_filter)[
+            server
+        ].snapshot
+        if (cached := cache.get(key, version)) is not None:
+            ids, start_index, start_tab_name, display_formatter = cached
+            source = self.get_asset_source(ctx)
+            return FilterResults(
+                master_filter=self,
+                command_source_info=filter_processor.source,
+                values=[source[i] for i in ids],
+                server=server,
+                start_index=start_index,
+                start_tab_name=start_tab_name,
+                display_formatter=display_formatter,
+            )
+        results = filter_processor.get(arg, ctx)
+        if results.is_cacheable:
+            cache.put(
+                key,
+                (
+                    tuple(v.id for v in results.values),
+                    results.start_index,
+                    results.start_tab_name,
+                    results.display_formatter,
+                ),
+                version,
+            )
+        return results
+
     def get_simple_detail_view(
         self,
         ctx: PrefContext,
@@ -337,7 +430,7 @@ class MasterFilter(Generic[TData], metaclass=MasterFilterMeta):
         async def command(ctx, *, arg: Optional[ParsedArguments]):
             await ctx.defer()
             arg = arg or await ParsedArguments.convert(ctx, "")
-            results = filter_processor.get(arg, ctx)
+            results = await self.get_filter_results(filter_processor, arg, ctx)
             if not results.values:
                 await ctx.send("No results.")
                 return
@@ -420,6 +513,7 @@ class CommandSourceInfo:
     shortcut_buttons: List[ShortcutButtonInfo] = dataclasses.field(
         default_factory=lambda: []
     )
+    is_volatile: bool = False
 
     def __call__(self, *args, **kwargs):
         return self.embed_source(*args, **kwargs)
@@ -441,12 +535,16 @@ def command_source(
     tabs: Optional[Sequence[AnyEmoji]] = None,
     default_tab: int = 0,
     suffix_tab_aliases: Optional[Dict[str, int]] = None,
+    is_volatile: bool = False,
 ) -> Callable[[EmbedSourceCallable], AnnotatedEmbedSourceCallable]:
     """A decorator that marks a function as an command source.
 
     The function should have, apart from the self parameter, either two more parameters
     if ``tabs`` is not specified, one for the context and one for the master asset,
     or three more with an additional parameter for the tab index.
+
+    Built embeds are cached unless ``is_volatile`` is set,
+    which should be done if the embed depends on the current time.
     """
 
     def decorator(func: EmbedSourceCallable) -> AnnotatedEmbedSourceCallable:
@@ -456,6 +554,7 @@ def command_source(
             tabs=tabs,
             default_tab=default_tab,
             suffix_tab_aliases=suffix_tab_aliases,
+            is_volatile=is_volatile,
         )
         func._command_source_info = info
 
@@ -528,6 +627,8 @@ class DataAttributeInfo:
     init_function: Optional[Callable] = None
     help_sample_argument: Optional[str] = None
     regex: Optional[Union[str, re.Pattern]] = None
+    is_volatile: bool = False
+    is_cacheable: bool = False
 
     def __hash__(self):
         return self.name.__hash__()
@@ -551,6 +652,7 @@ def data_attribute(
     is_eq: bool = False,
     help_sample_argument: Optional[str] = None,
     regex: Optional[Union[str, re.Pattern]] = None,
+    is_volatile: bool = False,
 ):
     """Marks a function as a data attribute.
 
@@ -605,6 +707,10 @@ def data_attribute(
         The regex to match for search or display.
         If present, the function should have an additional argument called "match",
         where the matched regex will be passed.
+    is_volatile
+        Marks the attribute as depending on the current time or other changing state.
+        Attributes that are not volatile, take no context, and have no regex
+        have their values cached per server.
     """
 
     def decorator(func):
@@ -626,6 +732,12 @@ def data_attribute(
             is_eq=is_eq,
             help_sample_argument=help_sample_argument,
             regex=regex,
+            is_volatile=is_volatile,
+            is_cacheable=(
+                not is_volatile
+                and not regex
+                and len(getfullargspec(func).args) == 2
+            ),
         )
         func._data_attribute_info = info
 
@@ -65,6 +65,7 @@ class MasterFilterManager:
                 setattr(self, attribute_name, master_filter)
 
     def reload(self):
+        self.charts.cancel_score_table_build()
         self.filters.clear()
         for module, values in _MODULES.items():
             module = importlib.import_module(module)
@@ -399,7 +399,7 @@ class MusicFilter(MasterFilter[MusicMaster]):
         else:
             return " N/A"
 
-    @data_attribute("expiring", is_flag=True)
+    @data_attribute("expiring", is_flag=True, is_volatile=True)
     def expiring(self, value: MusicMaster):
         return (
             timedelta(0)
@@ -407,11 +407,11 @@ class MusicFilter(MasterFilter[MusicMaster]):
             < timedelta(days=365 * 2)
         )
 
-    @data_attribute("expired", is_flag=True)
+    @data_attribute("expired", is_flag=True, is_volatile=True)
     def expired(self, value: MusicMaster):
         return value.end_datetime <= datetime.now(timezone.utc)
 
-    @data_attribute("playable", is_flag=True)
+    @data_attribute("playable", is_flag=True, is_volatile=True)
     def playable(self, value: MusicMaster):
         return value.is_available and not value.is_hidden and value.id > 3
 
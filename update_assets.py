@@ -1,11 +1,144 @@
 import argparse
 import asyncio
+import hashlib
+import json
 import logging
 import logging.config
+import multiprocessing
+import os
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple
 
 import pytz
 from d4dj_utils.extended.manager.revision_manager import RevisionManager
 from d4dj_utils.master.asset_manager import AssetManager
+from d4dj_utils.master.chart_master import ChartMaster
+
+from miyu_bot.commands.common.asset_paths import (
+    find_exported_assets,
+    update_asset_manifest,
+)
+
+# Per worker process state, set up once by _initialize_worker
+_worker_assets: Optional[AssetManager] = None
+
+
+def _initialize_worker(asset_path: str):
+    global _worker_assets
+    _worker_assets = AssetManager(asset_path)
+
+
+def _hash_chart_data(master: ChartMaster) -> str:
+    """Hashes the chart data file that load_chart_data reads."""
+    digest = hashlib.sha256()
+    with master.chart_path.open("rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _render_chart(
+    chart_id: int, previous_hash: Optional[str]
+) -> Tuple[int, Optional[str], Optional[float]]:
+    """Renders a chart unless its data is unchanged since the previous render.
+
+    Returns the hash of the chart data (None if missing) and the time taken
+    to render (None if skipped).
+    """
+    charts = _worker_assets.chart_master
+    master = charts[chart_id]
+    try:
+        chart_hash = _hash_chart_data(master)
+    except FileNotFoundError:
+        return chart_id, None, None
+    if (
+        chart_hash == previous_hash
+        and master.image_path.exists()
+        and master.mix_path.exists()
+    ):
+        return chart_id, chart_hash, None
+    start_time = timeit.default_timer()
+    # render_charts_by_master renders every chart in the master, so this worker's
+    # copy is narrowed down to the one chart while rendering
+    all_charts = dict(charts)
+    charts.clear()
+    charts[chart_id] = master
+    try:
+        _worker_assets.render_charts_by_master()
+    finally:
+        charts.clear()
+        charts.update(all_charts)
+    return chart_id, chart_hash, timeit.default_timer() - start_time
+
+
+def render_charts(asset_path: str, jobs: int, force: bool = False):
+    """Renders charts in a pool of worker processes, skipping unchanged ones.
+
+    Writes the render time of each chart to chart_render_report.tsv.
+    """
+    logger = logging.getLogger(__name__)
+    hashes_path = Path(asset_path) / "chart_render_hashes.json"
+    report_path = Path(asset_path) / "chart_render_report.tsv"
+    try:
+        with hashes_path.open() as f:
+            previous_hashes = {} if force else json.load(f)
+    except (OSError, ValueError):
+        previous_hashes = {}
+
+    start_time = timeit.default_timer()
+    chart_ids = list(AssetManager(asset_path).chart_master.keys())
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        # Forking would copy the already loaded asset manager into every worker
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_initialize_worker,
+        initargs=(asset_path,),
+    ) as executor:
+        results = list(
+            executor.map(
+                _render_chart,
+                chart_ids,
+                [previous_hashes.get(str(chart_id)) for chart_id in chart_ids],
+                chunksize=4,
+            )
+        )
+    elapsed = timeit.default_timer() - start_time
+
+    chart_hashes = {
+        str(chart_id): chart_hash
+        for chart_id, chart_hash, _ in results
+        if chart_hash is not None
+    }
+    tmp_path = hashes_path.with_suffix(".json.tmp")
+    with tmp_path.open("w") as f:
+        json.dump(chart_hashes, f)
+    os.replace(tmp_path, hashes_path)
+
+    render_times = sorted(
+        (
+            (seconds, chart_id)
+            for chart_id, _, seconds in results
+            if seconds is not None
+        ),
+        reverse=True,
+    )
+    with report_path.open("w") as f:
+        f.write("chart_id\tseconds\n")
+        for seconds, chart_id in render_times:
+            f.write(f"{chart_id}\t{seconds:.3f}\n")
+    total_render_time = sum(seconds for seconds, _ in render_times)
+    logger.info(
+        f"Rendered {len(render_times)} of {len(chart_ids)} charts "
+        f"({len(chart_ids) - len(chart_hashes)} without chart data) in {elapsed:.1f}s, "
+        f"{total_render_time:.1f}s of rendering across {jobs} workers."
+    )
+    if render_times:
+        logger.info(
+            "Slowest charts: "
+            + ", ".join(f"{chart_id} ({s:.2f}s)" for s, chart_id in render_times[:5])
+        )
 
 
 async def main():
@@ -15,6 +148,12 @@ async def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("version", type=str)
     parser.add_argument("server", type=str)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--force-render",
+        action="store_true",
+        help="render every chart, even if its chart data is unchanged",
+    )
     args = parser.parse_args()
 
     if args.server == "jp":
@@ -29,8 +168,13 @@ async def main():
     revision_manager = RevisionManager(asset_path, base_url)
     await revision_manager.repair_downloads()
     await revision_manager.update_assets(lambda p: "plain" not in p)
-    manager = AssetManager(asset_path)
-    manager.render_charts_by_master()
+    render_charts(asset_path, args.jobs, args.force_render)
+
+    paths = [
+        path for p in ["assets", "assets_en"] for path in find_exported_assets(Path(p))
+    ]
+    hashed = update_asset_manifest(paths)
+    logger.info(f"Updated asset manifest ({hashed} of {len(paths)} files hashed).")
 
 
 if __name__ == "__main__":